@@ -1,50 +1,223 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+
 # Importons les librairies pour faire les transformations stemming et lemmatization et le tokenizer de nltk
+import nltk
 from nltk.stem import PorterStemmer
 from nltk.stem import WordNetLemmatizer
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 
-# Téléchargement des dépendance NLTP
-import nltk
-nltk.download('stopwords')
-nltk.download('wordnet')
-nltk.download('punkt_tab')
+from vocabulary_cache import VOCABULARY_CACHE_MAX_ENTRIES, VocabularyCache
+
+# Ressources NLTK utilisées et leur chemin dans nltk_data
+NLTK_RESOURCES = {
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+    'punkt_tab': 'tokenizers/punkt_tab'
+}
+
+# Nombre de textes envoyés à la fois à un processus de travail
+TOKENIZATION_CHUNK_SIZE = 512
+# Nombre de lignes lues à la fois dans un CSV
+CSV_CHUNK_ROWS = 10_000
+
+_download_lock = threading.Lock()
+
+
+def _resource_available(path: str) -> bool:
+    """Indique si une ressource est présente dans nltk_data (dossier ou archive zip)"""
+    for candidate in (path, f'{path}.zip'):
+        try:
+            nltk.data.find(candidate)
+            return True
+        except LookupError:
+            pass
+    return False
+
+
+@lru_cache(maxsize=None)
+def ensure_nltk_resource(name: str) -> None:
+    """
+    Vérifie qu'une ressource NLTK est disponible et ne la télécharge que si elle manque
+
+    Le dossier nltk_data sert de cache partagé entre les processus : une fois la
+    ressource téléchargée, les autres processus la trouvent sans accès réseau.
+    Dans un même processus, la vérification n'est faite qu'une fois.
+    """
+    path = NLTK_RESOURCES[name]
+    if _resource_available(path):
+        return
+
+    with _download_lock:
+        if not _resource_available(path):
+            nltk.download(name, quiet=True)
+
+    if not _resource_available(path):
+        raise LookupError(f"Ressource NLTK '{name}' introuvable et impossible à télécharger")
+
+
+@lru_cache(maxsize=None)
+def get_stop_words(language: str = 'english') -> frozenset:
+    """Retourne les stop words d'une langue, chargés une seule fois (test d'appartenance en O(1))"""
+    ensure_nltk_resource('stopwords')
+    return frozenset(stopwords.words(language))
 
-text = 'Text preprocessing helps improve the quality and reliability of NLP'
 
 # Correction
 class Processing:
-    def __init__ (self):
+    def __init__ (self, language: str = 'english', vocabulary_path: str = None,
+                  max_cached_tokens: int = VOCABULARY_CACHE_MAX_ENTRIES):
+        # Les ressources NLTK ne sont chargées qu'à la première utilisation
+        self.language = language
         self.stemmer = PorterStemmer()
-        self.lemmatizer = WordNetLemmatizer()
-        self.stop_words = stopwords.words('english')
+        self._lemmatizer = None
+        # Racine et lemme des tokens déjà rencontrés (un mot fréquent n'est traité qu'une fois),
+        # relus depuis vocabulary_path s'il a été enregistré par save_vocabulary
+        self.vocabulary = VocabularyCache(vocabulary_path, max_cached_tokens)
+
+    @property
+    def stop_words(self) -> frozenset:
+        return get_stop_words(self.language)
 
+    @property
+    def lemmatizer(self) -> WordNetLemmatizer:
+        if self._lemmatizer is None:
+            ensure_nltk_resource('wordnet')
+            self._lemmatizer = WordNetLemmatizer()
+        return self._lemmatizer
+
+    def stem(self, token: str) -> str:
+        return self.vocabulary.lookup(token, 'stem', self.stemmer.stem)
+
+    def lemmatize(self, token: str) -> str:
+        return self.vocabulary.lookup(token, 'lemma', lambda word: self.lemmatizer.lemmatize(word))
+
+    def save_vocabulary(self, path: str = None) -> None:
+        """Enregistre les racines et lemmes calculés pour les prochains démarrages"""
+        self.vocabulary.save(path)
 
     def tokenization(self, text:str, stem : bool = False, lem : bool = False) -> list:
-        tokens =  [x.lower() for x in word_tokenize(text) if x.lower() not in self.stop_words]
+        ensure_nltk_resource('punkt_tab')
+        stop_words = self.stop_words
+        tokens = [token for token in (x.lower() for x in word_tokenize(text)) if token not in stop_words]
 
 
         if stem:
-            tokens = [self.stemmer.stem(token) for token in tokens]
+            tokens = [self.stem(token) for token in tokens]
 
         if lem:
-            tokens = [self.lemmatizer.lemmatize(token) for token in tokens]
+            tokens = [self.lemmatize(token) for token in tokens]
         return tokens
 
-process = Processing()
-result = process.tokenization(text, True, True)
-print(result)
+    def tokenize_batch(self, texts, stem: bool = False, lem: bool = False, processes: int = None,
+                       chunk_size: int = TOKENIZATION_CHUNK_SIZE, column=0):
+        """
+        Tokenise un corpus en parallèle et retourne les résultats au fur et à mesure
+
+        Les textes sont découpés en paquets de chunk_size, répartis sur un pool de
+        processus (un par cœur par défaut). Seuls quelques paquets sont en cours à la
+        fois : le corpus est lu au rythme du traitement, sans être chargé en mémoire.
+
+        Args:
+            texts: Itérable de textes, ou chemin d'un CSV lu par blocs (voir iter_csv_texts)
+            stem: Appliquer le stemming
+            lem: Appliquer la lemmatisation
+            processes: Nombre de processus (1 pour tout traiter dans le processus courant)
+            chunk_size: Nombre de textes par paquet
+            column: Colonne du CSV à tokeniser (nom ou position)
+
+        Yields:
+            list: Tokens de chaque texte, dans l'ordre du corpus
+        """
+        if isinstance(texts, (str, os.PathLike)):
+            texts = iter_csv_texts(texts, column)
+
+        # Les ressources sont vérifiées ici pour ne pas être téléchargées par chaque processus
+        ensure_nltk_resource('punkt_tab')
+        ensure_nltk_resource('stopwords')
+        if lem:
+            ensure_nltk_resource('wordnet')
+
+        processes = processes or os.cpu_count() or 1
+        chunks = _iter_chunks(texts, chunk_size)
+
+        if processes == 1:
+            for chunk in chunks:
+                for text in chunk:
+                    yield self.tokenization(text, stem, lem)
+            return
+
+        # Chaque processus relit le même fichier de vocabulaire et renvoie ses nouveaux résultats
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(self.language, self.vocabulary.path,
+                                           self.vocabulary.max_entries)) as executor:
+            # Les paquets sont rendus dans l'ordre de soumission, avec 2 paquets d'avance par processus
+            pending = deque(
+                executor.submit(_tokenize_chunk, chunk, stem, lem)
+                for chunk in islice(chunks, 2 * processes)
+            )
+            while pending:
+                results, new_vocabulary = pending.popleft().result()
+                self.vocabulary.update(new_vocabulary)
+                for chunk in islice(chunks, 1):
+                    pending.append(executor.submit(_tokenize_chunk, chunk, stem, lem))
+                yield from results
+
+
+def iter_csv_texts(path, column=0, chunk_rows: int = CSV_CHUNK_ROWS):
+    """
+    Lit une colonne de textes d'un CSV par blocs de chunk_rows lignes
+
+    Yields:
+        str: Texte de chaque ligne (chaîne vide pour une cellule vide)
+    """
+    import pandas as pd
+
+    for frame in pd.read_csv(path, usecols=[column], chunksize=chunk_rows):
+        for value in frame.iloc[:, 0]:
+            yield value if isinstance(value, str) else ('' if pd.isna(value) else str(value))
+
+
+def _iter_chunks(items, size: int):
+    """Regroupe un itérable en listes de size éléments"""
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+# Instance propre à chaque processus de travail, dont la table de racines et lemmes
+# se remplit au fil des paquets
+_worker_processing = None
+
+
+def _init_worker(language: str, vocabulary_path: str, max_cached_tokens: int) -> None:
+    global _worker_processing
+    _worker_processing = Processing(language, vocabulary_path, max_cached_tokens)
+
+
+def _tokenize_chunk(texts: list, stem: bool, lem: bool) -> tuple:
+    tokens = [_worker_processing.tokenization(text, stem, lem) for text in texts]
+    return tokens, _worker_processing.vocabulary.drain_new()
+
+if __name__ == "__main__":
+    text = 'Text preprocessing helps improve the quality and reliability of NLP'
+
+    process = Processing()
+    result = process.tokenization(text, True, True)
+    print(result)
 
-# Pour le CSV 
-import pandas as pd
-import string 
+    # Pour le CSV : seule la première ligne est lue
+    import string
 
-df = pd.read_csv('QA_bot.csv')
-text = df.values[0][0]
+    text = next(iter_csv_texts('QA_bot.csv'))
 
-process = Processing()
-result = process.tokenization(text, True, True)
+    result = process.tokenization(text, True, True)
 
-for elem in result: # On retire les tokens avec uniquement la ponctuation
-  if elem not in string.punctuation:
-    print(elem)
\ No newline at end of file
+    for elem in result: # On retire les tokens avec uniquement la ponctuation
+      if elem not in string.punctuation:
+        print(elem)
@@ -1,51 +1,126 @@
 from Processing import Processing
-from transformers import pipeline
-from transformers import BertTokenizer, BertModel
+from embedding_engine import EmbeddingEngine
+from model_registry import get_model_registry
+
+# Nombre de textes passés ensemble au modèle par les méthodes *_batch
+INFERENCE_BATCH_SIZE = 32
+
+
+def run_bucketed(pipe, texts, batch_size=INFERENCE_BATCH_SIZE, **kwargs):
+    """
+    Applique un pipeline à une liste de textes par lots, regroupés par longueur
+
+    Les textes sont triés par longueur avant d'être découpés en lots : chaque lot
+    est complété (padding) jusqu'à son plus long texte, des textes de longueurs
+    voisines limitent donc les calculs inutiles. Les résultats sont rendus dans
+    l'ordre d'origine.
+    """
+    import torch
+
+    texts = list(texts)
+    if not texts:
+        return []
+
+    order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+    with torch.inference_mode():
+        outputs = pipe([texts[index] for index in order], batch_size=batch_size, **kwargs)
+
+    results = [None] * len(texts)
+    for index, output in zip(order, outputs):
+        results[index] = output
+    return results
+
 
 class TextProcessor(Processing) :
-    def __init__(self):
-        super(Processing, self).__init__()
+    def __init__(self, registry=None, embedding_store=None):
+        super().__init__()
+        # Les modèles sont chargés une seule fois, à la première utilisation, et partagés
+        self.models = registry or get_model_registry()
+        # Embeddings mis en cache par texte, et enregistrés dans embedding_store s'il est fourni
+        self.embeddings = EmbeddingEngine(self.models, embedding_store)
 
     def translate_to_french(self, english_text):
         # Here you would implement the translation logic
-        traduction = pipeline("translation_en_to_fr")
+        traduction = self.models.get('translation')
         french_text = traduction(english_text)
 
         return f'Le texte traduit en français : {french_text}'
+
+    def translate_batch(self, english_texts, batch_size=INFERENCE_BATCH_SIZE):
+        """Traduit une liste de textes (une traduction par texte, dans l'ordre)"""
+        outputs = run_bucketed(self.models.get('translation'), english_texts, batch_size, truncation=True)
+        return [output['translation_text'] for output in outputs]
     
     def extract_entities(self, text):
         # Here you would implement the entity extraction logic
-        nlp = pipeline("ner", aggregation_strategy="simple")
+        nlp = self.models.get('ner')
         entities = nlp(text)
         
         return f'Les entités extraites : {entities}'
+
+    def extract_entities_batch(self, texts, batch_size=INFERENCE_BATCH_SIZE):
+        """
+        Extrait les entités d'une liste de textes
+
+        Returns:
+            list: Pour chaque texte, la liste des entités {"entity_group", "word", "score", "start", "end"}
+        """
+        outputs = run_bucketed(self.models.get('ner'), texts, batch_size)
+        return [
+            [
+                {
+                    'entity_group': entity['entity_group'],
+                    'word': entity['word'],
+                    'score': float(entity['score']),
+                    'start': entity['start'],
+                    'end': entity['end']
+                }
+                for entity in entities
+            ]
+            for entities in outputs
+        ]
     
     def analyze_sentiment(self, text):
         # Here you would implement the sentiment analysis logic
-        sentiment_analyzer = pipeline("sentiment-analysis")
+        sentiment_analyzer = self.models.get('sentiment')
         sentiment = sentiment_analyzer(text)
         
         return f'Analyse de sentiment : {sentiment}'
+
+    def analyze_sentiment_batch(self, texts, batch_size=INFERENCE_BATCH_SIZE):
+        """
+        Analyse le sentiment d'une liste de textes
+
+        Returns:
+            list: Pour chaque texte, {"label", "score"}
+        """
+        outputs = run_bucketed(self.models.get('sentiment'), texts, batch_size, truncation=True)
+        return [{'label': output['label'], 'score': float(output['score'])} for output in outputs]
     
     #Extraction d'Embeddings : Ajoutez une méthode extract_embeddings qui prend un texte comme argument et renvoie ses embeddings. Pour cela, utilisez le BertTokenizer.from_pretrained('bert-base-uncased') pour tokenizer le texte, puis utilisez un modèle BERT pour obtenir les embeddings. Pensez à gérer la conversion entre les tokens et les embeddings en utilisant le modèle BERT approprié.
     def extract_embeddings (self, text):
-        tokenizer = BertTokenizer.from_pretrained('bert-base-uncased')
-        model = BertModel.from_pretrained('bert-base-uncased')
-        inputs = tokenizer(text, return_tensors='pt')
-        outputs = model(**inputs)
-        embeddings = outputs.last_hidden_state.mean(dim=1).squeeze().tolist()
-        return f'Les embeddings extraits : {embeddings}'
+        # Vecteur float32 (moyenne des états cachés sur les tokens réels du texte)
+        return self.embeddings.embed([text])[0]
+
+    def extract_embeddings_batch(self, texts):
+        """Retourne les embeddings d'une liste de textes (matrice float32, une ligne par texte)"""
+        return self.embeddings.embed(texts)
     
     #Génération de Texte : Ajoutez une méthode generate_text qui utilise pipeline("text-generation", model="gpt2") pour générer du texte à partir d'une prompt donnée.
     def generate_text(self, prompt):
-        text_generator = pipeline("text-generation", model="gpt2")
+        text_generator = self.models.get('generation')
         generated_text = text_generator(prompt)
         return f'Texte généré : {generated_text}'
 
 #Test
-test = TextProcessor()
-print(test.translate_to_french("This day I feel good"))
-print(test.extract_entities("Barack Obama was the 44th president of the United States."))
-print(test.analyze_sentiment("I love programming!"))
-print(test.extract_embeddings("Hello, my dog is cute"))
-print(test.generate_text("Once upon a time, a lord lived in a castle."))
\ No newline at end of file
+if __name__ == "__main__":
+    test = TextProcessor()
+    test.models.warmup()
+    print(test.models.stats())
+    print(test.translate_to_french("This day I feel good"))
+    print(test.extract_entities("Barack Obama was the 44th president of the United States."))
+    print(test.analyze_sentiment("I love programming!"))
+    print(test.analyze_sentiment_batch(["I love programming!", "This bug is driving me crazy.", "Fine."]))
+    embeddings = test.extract_embeddings("Hello, my dog is cute")
+    print(f'Les embeddings extraits : {embeddings.shape} {embeddings[:5]}')
+    print(test.generate_text("Once upon a time, a lord lived in a castle."))
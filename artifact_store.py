@@ -0,0 +1,239 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from io import BytesIO
+
+import streamlit as st
+from PIL import Image
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from response_cache import CACHE_DIR
+
+# Dossier contenant un sous-dossier par session
+ARTIFACT_DIR = os.path.join(CACHE_DIR, "sessions")
+# Espace disque maximum des originaux d'une session
+SESSION_DISK_MAX_BYTES = 200 * 1024 * 1024
+# Nombre maximum de vignettes gardées en mémoire par session
+SESSION_MAX_THUMBNAILS = 200
+THUMBNAIL_SIZE = (256, 256)
+# Les dossiers de sessions inactives depuis plus longtemps sont supprimés
+STALE_SESSION_SECONDS = 24 * 3600
+
+# Stores vivants du processus : leurs dossiers ne sont jamais considérés comme abandonnés
+_live_stores = weakref.WeakSet()
+
+
+class ArtifactStore:
+    """
+    Stockage des images d'une session à mémoire bornée
+
+    Seule une vignette JPEG de chaque image reste en mémoire ; l'original est
+    écrit dans le dossier de la session. Au-delà de max_disk_bytes, les originaux
+    les moins récemment utilisés sont supprimés (leur vignette reste affichable),
+    et au-delà de max_thumbnails, les plus anciennes vignettes sont oubliées.
+    Le dossier est supprimé quand le store est libéré (fin de session).
+    """
+
+    def __init__(self, directory, max_disk_bytes=SESSION_DISK_MAX_BYTES,
+                 max_thumbnails=SESSION_MAX_THUMBNAILS, thumbnail_size=THUMBNAIL_SIZE):
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.max_thumbnails = max_thumbnails
+        self.thumbnail_size = thumbnail_size
+
+        # Taille sur disque de chaque original, du moins au plus récemment utilisé
+        self._originals = OrderedDict()
+        self._thumbnails = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._finalizer = weakref.finalize(self, shutil.rmtree, directory, True)
+        _live_stores.add(self)
+
+    def _path(self, artifact_id):
+        return os.path.join(self.directory, artifact_id)
+
+    def touch(self):
+        """Marque le dossier comme utilisé (le balayage des sessions abandonnées se fie à sa date)"""
+        try:
+            os.utime(self.directory)
+        except OSError:
+            pass
+
+    def _make_thumbnail(self, data):
+        """Réduit une image en vignette JPEG (None si les données ne sont pas une image)"""
+        try:
+            image = Image.open(BytesIO(data))
+            image.draft("RGB", self.thumbnail_size)
+            image.thumbnail(self.thumbnail_size, Image.Resampling.LANCZOS)
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            buffer = BytesIO()
+            image.save(buffer, format="JPEG", quality=80)
+            return buffer.getvalue()
+        except Exception:
+            return None
+
+    def put(self, data):
+        """
+        Enregistre une image encodée (PNG, JPEG...) sans la réencoder
+
+        Returns:
+            str: Identifiant de l'image dans le store
+        """
+        artifact_id = uuid.uuid4().hex
+        thumbnail = self._make_thumbnail(data)
+
+        # Le dossier a pu être supprimé comme inactif par une autre session
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(artifact_id), "wb") as file:
+            file.write(data)
+
+        with self._lock:
+            self._originals[artifact_id] = len(data)
+            if thumbnail is not None:
+                self._thumbnails[artifact_id] = thumbnail
+            self._evict()
+
+        return artifact_id
+
+    def put_file(self, write):
+        """
+        Enregistre un fichier écrit directement sur disque (archive ZIP...), sans le garder en mémoire
+
+        Args:
+            write: Fonction appelée avec le fichier ouvert en écriture binaire
+
+        Returns:
+            str: Identifiant du fichier dans le store
+        """
+        artifact_id = uuid.uuid4().hex
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(artifact_id), "wb") as file:
+            write(file)
+
+        with self._lock:
+            self._originals[artifact_id] = os.path.getsize(self._path(artifact_id))
+            self._evict()
+
+        return artifact_id
+
+    def put_image(self, image, image_format="PNG"):
+        """Encode une image PIL une seule fois puis l'enregistre"""
+        buffer = BytesIO()
+        image.save(buffer, format=image_format)
+        return self.put(buffer.getvalue())
+
+    def _evict(self):
+        """Supprime les originaux et vignettes les plus anciens au-delà des limites"""
+        disk_bytes = sum(self._originals.values())
+        while disk_bytes > self.max_disk_bytes and len(self._originals) > 1:
+            artifact_id, size = self._originals.popitem(last=False)
+            disk_bytes -= size
+            try:
+                os.remove(self._path(artifact_id))
+            except OSError:
+                pass
+
+        while len(self._thumbnails) > self.max_thumbnails:
+            self._thumbnails.popitem(last=False)
+
+    def get(self, artifact_id):
+        """Retourne l'original (bytes), ou None s'il a été évincé"""
+        with self._lock:
+            if artifact_id not in self._originals:
+                return None
+            self._originals.move_to_end(artifact_id)
+
+        try:
+            with open(self._path(artifact_id), "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def open_file(self, artifact_id):
+        """Ouvre l'original en lecture binaire, ou retourne None s'il a été évincé"""
+        with self._lock:
+            if artifact_id not in self._originals:
+                return None
+            self._originals.move_to_end(artifact_id)
+
+        try:
+            return open(self._path(artifact_id), "rb")
+        except OSError:
+            return None
+
+    def open_image(self, artifact_id):
+        """Retourne l'original sous forme d'image PIL, ou None s'il a été évincé"""
+        data = self.get(artifact_id)
+        return Image.open(BytesIO(data)) if data is not None else None
+
+    def thumbnail(self, artifact_id):
+        """Retourne la vignette JPEG (bytes), ou None si elle a été oubliée"""
+        with self._lock:
+            return self._thumbnails.get(artifact_id)
+
+    def discard(self, artifact_id):
+        """Supprime une image du store"""
+        with self._lock:
+            self._thumbnails.pop(artifact_id, None)
+            if self._originals.pop(artifact_id, None) is None:
+                return
+
+        try:
+            os.remove(self._path(artifact_id))
+        except OSError:
+            pass
+
+    def usage(self):
+        """Retourne l'occupation mémoire et disque du store"""
+        with self._lock:
+            return {
+                "items": len(self._originals),
+                "memory_bytes": sum(len(thumbnail) for thumbnail in self._thumbnails.values()),
+                "disk_bytes": sum(self._originals.values())
+            }
+
+
+def _remove_stale_sessions(max_age=STALE_SESSION_SECONDS):
+    """Supprime les dossiers de sessions abandonnés (processus arrêté sans nettoyage)"""
+    if not os.path.isdir(ARTIFACT_DIR):
+        return
+
+    live_directories = {os.path.abspath(store.directory) for store in list(_live_stores)}
+    now = time.time()
+    for entry in os.scandir(ARTIFACT_DIR):
+        try:
+            if os.path.abspath(entry.path) in live_directories:
+                continue
+            if entry.is_dir() and now - entry.stat().st_mtime > max_age:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def get_artifact_store():
+    """Retourne le store de la session courante (créé au premier appel)"""
+    if "artifact_store" not in st.session_state:
+        _remove_stale_sessions()
+        ctx = get_script_run_ctx()
+        session_id = ctx.session_id if ctx is not None else uuid.uuid4().hex
+        st.session_state.artifact_store = ArtifactStore(os.path.join(ARTIFACT_DIR, session_id))
+
+    store = st.session_state.artifact_store
+    # Chaque rerun de la session rafraîchit la date du dossier
+    store.touch()
+    return store
+
+
+def show_artifact_usage(store):
+    """Affiche l'occupation du store de la session dans la page courante"""
+    usage = store.usage()
+    st.caption(
+        f"🗄️ Session : {usage['items']} image(s) · {usage['memory_bytes'] / 1024:.0f} Ko en mémoire, "
+        f"{usage['disk_bytes'] / (1024 * 1024):.1f} Mo sur disque"
+    )
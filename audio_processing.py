@@ -0,0 +1,337 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+
+import numpy as np
+from pydub import AudioSegment
+
+from response_cache import cached_chat_completion, get_response_cache, make_cache_key
+
+# Limite de taille d'un fichier envoyé à Whisper
+WHISPER_MAX_BYTES = 25 * 1024 * 1024
+# Durée maximale d'un segment (10 min en MP3 mono 64 kbit/s ≈ 5 Mo)
+DEFAULT_MAX_CHUNK_MS = 10 * 60 * 1000
+# Fenêtre, avant la limite d'un segment, dans laquelle on cherche un silence
+SILENCE_SEARCH_MS = 30 * 1000
+# Résolution de l'analyse d'énergie
+FRAME_MS = 100
+# Nombre de trames converties à la fois lors de l'analyse d'énergie (1 min)
+ENERGY_BLOCK_FRAMES = 600
+
+# Type des échantillons PCM selon leur taille en octets (signés, comme dans pydub)
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+# Extension et type MIME de chaque conteneur audio accepté par Whisper
+AUDIO_FORMATS = {
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+    "flac": "audio/flac",
+    "ogg": "audio/ogg",
+    "m4a": "audio/mp4",
+    "webm": "audio/webm",
+    "aac": "audio/aac"
+}
+
+
+def sniff_audio_format(header):
+    """
+    Détermine le conteneur audio à partir des premiers octets du fichier
+
+    Args:
+        header: Au moins les 12 premiers octets du fichier
+
+    Returns:
+        str: Extension du format (clé de AUDIO_FORMATS), ou None si inconnu
+    """
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[4:8] == b"ftyp":
+        return "m4a"
+    if header[:4] == b"\x1aE\xdf\xa3":
+        return "webm"
+    if header[:3] == b"ID3":
+        return "mp3"
+    # Mot de synchronisation d'une trame : les bits de couche distinguent le MPEG audio
+    # (couches 1 à 3) de l'AAC ADTS (couche 0, en-têtes 0xFFF1 / 0xFFF9)
+    if len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0:
+        return "mp3" if header[1] & 0x06 else "aac"
+    return None
+
+
+def detect_audio_format(audio_file):
+    """Détermine le format réel d'un fichier uploadé, avec l'extension du nom en repli"""
+    if hasattr(audio_file, "getbuffer"):
+        # Lecture de l'en-tête sans copier le contenu du buffer
+        with audio_file.getbuffer() as view:
+            header = bytes(view[:12])
+    else:
+        position = audio_file.tell()
+        header = audio_file.read(12)
+        audio_file.seek(position)
+
+    audio_format = sniff_audio_format(header)
+    if audio_format is None:
+        extension = os.path.splitext(getattr(audio_file, "name", ""))[1].lstrip(".").lower()
+        audio_format = extension if extension in AUDIO_FORMATS else "mp3"
+    return audio_format
+
+
+def prepare_audio_upload(audio_file):
+    """
+    Prépare un fichier uploadé pour l'API sans le recopier ni l'écrire sur disque
+
+    Le SDK OpenAI accepte un tuple (nom, fichier, type MIME) : le fichier en mémoire
+    est envoyé tel quel, avec un nom et un type correspondant à son contenu réel.
+
+    Returns:
+        tuple: (nom de fichier, objet fichier, type MIME)
+    """
+    audio_format = detect_audio_format(audio_file)
+    base_name = os.path.splitext(os.path.basename(getattr(audio_file, "name", "") or "audio"))[0]
+
+    audio_file.seek(0)
+    return f"{base_name}.{audio_format}", audio_file, AUDIO_FORMATS[audio_format]
+
+
+def frame_energies(audio, frame_ms=FRAME_MS, frames_per_block=ENERGY_BLOCK_FRAMES):
+    """
+    Calcule l'énergie RMS de chaque trame de frame_ms millisecondes (mono)
+
+    Les échantillons sont lus directement dans les données PCM du segment, sans
+    copie, puis convertis bloc par bloc : la mémoire utilisée reste bornée par
+    la taille d'un bloc, même pour un enregistrement de plusieurs heures.
+    """
+    dtype = SAMPLE_DTYPES.get(audio.sample_width)
+    if dtype is None:
+        samples = np.asarray(audio.get_array_of_samples())
+    else:
+        samples = np.frombuffer(audio.raw_data, dtype=dtype)
+
+    channels = audio.channels
+    samples_per_frame = max(1, int(audio.frame_rate * frame_ms / 1000))
+    frame_count = len(samples) // (samples_per_frame * channels)
+    energies = np.zeros(frame_count, dtype=np.float32)
+
+    for first in range(0, frame_count, frames_per_block):
+        last = min(first + frames_per_block, frame_count)
+        block = samples[first * samples_per_frame * channels:last * samples_per_frame * channels]
+        frames = block.reshape(last - first, samples_per_frame, channels).astype(np.float64)
+        mono = frames.mean(axis=2) if channels > 1 else frames[:, :, 0]
+        energies[first:last] = np.sqrt(np.mean(mono ** 2, axis=1))
+
+    return energies
+
+
+def find_split_points(audio, max_chunk_ms=DEFAULT_MAX_CHUNK_MS, search_ms=SILENCE_SEARCH_MS, frame_ms=FRAME_MS):
+    """
+    Choisit les points de découpe d'un enregistrement
+
+    Chaque segment dure au plus max_chunk_ms. La coupure est placée sur la trame
+    la plus silencieuse des search_ms dernières millisecondes du segment, pour
+    éviter de couper un mot.
+
+    Returns:
+        list: Bornes (début, fin) de chaque segment, en millisecondes
+    """
+    duration = len(audio)
+    if duration <= max_chunk_ms:
+        return [(0, duration)]
+
+    energies = frame_energies(audio, frame_ms)
+    search_ms = min(search_ms, max_chunk_ms // 2)
+
+    bounds = []
+    start = 0
+    while duration - start > max_chunk_ms:
+        window_start = (start + max_chunk_ms - search_ms) // frame_ms
+        window_end = (start + max_chunk_ms) // frame_ms
+        window = energies[window_start:window_end]
+
+        if len(window):
+            cut = (window_start + int(np.argmin(window))) * frame_ms + frame_ms // 2
+        else:
+            cut = start + max_chunk_ms
+
+        bounds.append((start, cut))
+        start = cut
+
+    bounds.append((start, duration))
+    return bounds
+
+
+def export_chunk(audio, bitrate="64k"):
+    """Encode un segment en MP3 mono dans un buffer mémoire prêt pour l'API"""
+    buffer = BytesIO()
+    audio.set_channels(1).export(buffer, format="mp3", bitrate=bitrate)
+    buffer.seek(0)
+    buffer.name = "chunk.mp3"
+    return buffer
+
+
+def _transcribe_chunk(client, audio, start, end, model):
+    """Découpe, encode et transcrit un segment, puis décale ses horodatages au début du segment"""
+    # Le segment n'est extrait qu'au moment de son traitement : seuls max_workers
+    # segments existent en mémoire en même temps
+    chunk = audio[start:end]
+    offset_seconds = start / 1000
+    transcript = client.audio.transcriptions.create(
+        model=model,
+        file=export_chunk(chunk),
+        response_format="verbose_json"
+    )
+
+    segments = [
+        {
+            "start": segment.start + offset_seconds,
+            "end": segment.end + offset_seconds,
+            "text": segment.text.strip()
+        }
+        for segment in (transcript.segments or [])
+    ]
+    return transcript.text.strip(), segments
+
+
+def transcribe_long_audio(client, audio_file, audio_format=None, max_workers=4,
+                          max_chunk_ms=DEFAULT_MAX_CHUNK_MS, model="whisper-1", on_progress=None):
+    """
+    Transcrit un long enregistrement en segments traités en parallèle
+
+    Args:
+        client: Client OpenAI initialisé
+        audio_file: Fichier audio (chemin ou objet fichier)
+        audio_format: Format du fichier (mp3, wav...), déduit par ffmpeg si absent
+        max_workers: Nombre maximum de segments transcrits simultanément
+        max_chunk_ms: Durée maximale d'un segment
+        model: Modèle Whisper
+        on_progress: Fonction appelée avec (segments terminés, total) après chaque segment
+
+    Returns:
+        dict: Texte complet, segments horodatés et nombre de découpes
+    """
+    audio = AudioSegment.from_file(audio_file, format=audio_format)
+    bounds = find_split_points(audio, max_chunk_ms)
+
+    results = [None] * len(bounds)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                _transcribe_chunk,
+                client,
+                audio,
+                start,
+                end,
+                model
+            ): index
+            for index, (start, end) in enumerate(bounds)
+        }
+
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if on_progress is not None:
+                on_progress(done, len(bounds))
+
+    return {
+        "text": " ".join(text for text, _ in results if text),
+        "segments": [segment for _, segments in results for segment in segments],
+        "chunks": len(bounds)
+    }
+
+
+def format_timestamp(seconds):
+    """Formate une durée en secondes au format HH:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def audio_content_hash(audio_file):
+    """Calcule l'empreinte SHA-256 du contenu d'un fichier audio en mémoire"""
+    if hasattr(audio_file, "getbuffer"):
+        with audio_file.getbuffer() as view:
+            return hashlib.sha256(view).hexdigest()
+
+    audio_file.seek(0)
+    digest = hashlib.sha256(audio_file.read()).hexdigest()
+    audio_file.seek(0)
+    return digest
+
+
+def get_cached_transcript(client, audio_file, model="whisper-1", max_workers=4, on_progress=None):
+    """
+    Transcrit un fichier audio une seule fois par contenu
+
+    La transcription est enregistrée dans le cache de réponses sous l'empreinte
+    du fichier : un même enregistrement uploadé à nouveau n'est pas renvoyé à Whisper.
+    Les fichiers dépassant la limite de Whisper sont découpés automatiquement.
+
+    Returns:
+        tuple: (transcription, True si elle provient du cache)
+    """
+    cache = get_response_cache()
+    key = make_cache_key(model, [], audio_sha256=audio_content_hash(audio_file))
+
+    cached = cache.get(key)
+    if cached is not None:
+        return json.loads(cached)["content"], True
+
+    if audio_file.size > WHISPER_MAX_BYTES:
+        text = transcribe_long_audio(
+            client,
+            audio_file,
+            audio_format=detect_audio_format(audio_file),
+            max_workers=max_workers,
+            model=model,
+            on_progress=on_progress
+        )["text"]
+    else:
+        text = client.audio.transcriptions.create(
+            model=model,
+            file=prepare_audio_upload(audio_file)
+        ).text
+
+    cache.set(key, json.dumps({"content": text}, ensure_ascii=False).encode("utf-8"))
+    return text, False
+
+
+def build_translation_messages(text, target_language):
+    """Construit les messages envoyés à GPT pour traduire un texte"""
+    return [
+        {"role": "system", "content": f"Tu es un traducteur expert. Traduis le texte suivant en {target_language}."},
+        {"role": "user", "content": text}
+    ]
+
+
+def translate_text_concurrently(client, text, target_languages, max_workers=4, model="gpt-3.5-turbo"):
+    """
+    Traduit un même texte dans plusieurs langues en parallèle
+
+    Returns:
+        dict: Traduction par langue cible (ou message d'erreur préfixé par ❌)
+    """
+    cache = get_response_cache()
+
+    def translate(language):
+        return cached_chat_completion(
+            client,
+            model=model,
+            messages=build_translation_messages(text, language),
+            cache=cache,
+            max_tokens=1000
+        )
+
+    translations = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(translate, language): language for language in target_languages}
+        for future in as_completed(futures):
+            language = futures[future]
+            try:
+                translations[language] = future.result()
+            except Exception as e:
+                translations[language] = f"❌ Erreur lors de la traduction: {str(e)}"
+
+    return {language: translations[language] for language in target_languages}
@@ -0,0 +1,105 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+
+import openai
+
+
+class RateLimiter:
+    """
+    Limiteur de débit à seau de jetons, partagé entre threads
+
+    Autorise au plus requests_per_minute appels par minute, avec une rafale
+    initiale limitée à burst appels.
+    """
+
+    def __init__(self, requests_per_minute, burst=1):
+        self.interval = 60.0 / requests_per_minute
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Bloque jusqu'à ce qu'un appel soit autorisé"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) / self.interval)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait_time = (1 - self._tokens) * self.interval
+
+            time.sleep(wait_time)
+
+
+def _retry_delay(error, attempt, backoff):
+    """Délai avant une nouvelle tentative : en-tête Retry-After s'il existe, sinon exponentiel"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return backoff * 2 ** attempt
+
+
+def run_bounded(func, items, max_workers=4, requests_per_minute=None, max_retries=3, backoff=2.0):
+    """
+    Applique func à chaque élément en parallèle, avec une limite de débit
+
+    Seuls quelques éléments sont soumis à l'avance (2 × max_workers) : les suivants
+    sont lus dans l'itérable au fur et à mesure que des tâches se terminent, ce qui
+    borne la mémoire pour de très longues listes. Les erreurs 429 de l'API sont
+    retentées après le délai indiqué par l'API ou avec un délai exponentiel.
+
+    Args:
+        func: Fonction appelée avec un élément
+        items: Itérable d'éléments (éventuellement paresseux)
+        max_workers: Nombre d'appels simultanés
+        requests_per_minute: Débit maximum (None pour ne pas limiter)
+        max_retries: Nombre de nouvelles tentatives après une erreur 429
+        backoff: Délai de base (en secondes) entre deux tentatives
+
+    Yields:
+        tuple: (index de l'élément, résultat, exception ou None), dans l'ordre de terminaison
+    """
+    limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+
+    def call(item):
+        for attempt in range(max_retries + 1):
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                return func(item)
+            except openai.RateLimitError as e:
+                if attempt == max_retries:
+                    raise
+                time.sleep(_retry_delay(e, attempt, backoff))
+
+    indexed_items = enumerate(items)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending = {
+            executor.submit(call, item): index
+            for index, item in islice(indexed_items, max_workers * 2)
+        }
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index = pending.pop(future)
+                error = future.exception()
+                yield index, (None if error else future.result()), error
+
+            for index, item in islice(indexed_items, len(done)):
+                pending[executor.submit(call, item)] = index
+    finally:
+        # Si le générateur est abandonné (rerun Streamlit), les tâches en attente sont
+        # annulées et on n'attend pas la fin des appels déjà en cours
+        executor.shutdown(wait=False, cancel_futures=True)
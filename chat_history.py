@@ -0,0 +1,156 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Tokens ajoutés par l'API autour de chaque message (rôle, séparateurs)
+MESSAGE_OVERHEAD_TOKENS = 4
+# Après un dépassement, l'historique est réduit jusqu'à cette fraction du budget
+# pour ne pas déclencher un résumé à chaque nouveau message
+LOW_WATER_RATIO = 0.75
+
+SUMMARY_MODEL = "gpt-3.5-turbo"
+SUMMARY_PROMPT = (
+    "Tu résumes une conversation entre un utilisateur et un assistant. "
+    "Intègre le résumé précédent et les nouveaux échanges en un résumé concis "
+    "qui conserve les faits, décisions et préférences utiles pour la suite."
+)
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model):
+    """Charge l'encodage tiktoken du modèle une seule fois par processus"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """
+    Compte les tokens d'un texte
+
+    Utilise tiktoken s'il est installé, sinon une approximation locale
+    (environ 4 caractères par token).
+    """
+    if not text:
+        return 0
+
+    if tiktoken is not None:
+        return len(_get_encoding(model).encode(text))
+
+    return len(text) // 4 + 1
+
+
+def count_message_tokens(message, model="gpt-3.5-turbo"):
+    """Compte les tokens d'un message de chat, surcoût de formatage compris"""
+    return count_tokens(message.get("content") or "", model) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ConversationWindow:
+    """
+    Historique de conversation limité par un budget de tokens
+
+    L'historique complet est conservé, mais seuls les messages les plus récents
+    tenant dans le budget sont envoyés à l'API. Les échanges sortis de la fenêtre
+    sont condensés dans un résumé glissant. Le nombre de tokens de chaque message
+    est calculé une seule fois, à l'ajout.
+    """
+
+    def __init__(self, token_budget=3000, model="gpt-3.5-turbo", summarize=True):
+        self.token_budget = token_budget
+        self.model = model
+        self.summarize = summarize
+
+        self.messages = []
+        self._token_counts = []
+
+        # Index du premier message encore présent dans la fenêtre
+        self.start_index = 0
+        self._window_tokens = 0
+
+        self.summary = ""
+        self._summary_tokens = 0
+        self.summarized_messages = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def append(self, message):
+        """Ajoute un message à l'historique et met à jour le total de la fenêtre"""
+        tokens = count_message_tokens(message, self.model)
+        self.messages.append(message)
+        self._token_counts.append(tokens)
+        self._window_tokens += tokens
+
+    @property
+    def window_tokens(self):
+        """Nombre de tokens envoyés à l'API pour l'historique (résumé compris)"""
+        return self._window_tokens + self._summary_tokens
+
+    def context(self, client=None, reserved_tokens=0):
+        """
+        Retourne les messages à envoyer à l'API
+
+        Args:
+            client: Client OpenAI utilisé pour résumer les échanges retirés
+                (s'il est absent ou si le résumé échoue, ils sont simplement ignorés)
+            reserved_tokens: Tokens à garder libres, par exemple pour le nouveau message
+
+        Returns:
+            list: Message de résumé éventuel suivi des messages récents
+        """
+        if self.window_tokens + reserved_tokens > self.token_budget:
+            self._trim(client, reserved_tokens)
+
+        messages = []
+        if self.summary:
+            messages.append({
+                "role": "system",
+                "content": f"Résumé des échanges précédents : {self.summary}"
+            })
+        messages.extend(self.messages[self.start_index:])
+        return messages
+
+    def _trim(self, client, reserved_tokens):
+        """Retire les plus anciens échanges jusqu'à repasser sous le seuil bas"""
+        target = int(self.token_budget * LOW_WATER_RATIO) - reserved_tokens
+        dropped = []
+
+        # Le dernier message est toujours conservé
+        while self.start_index < len(self.messages) - 1 and self.window_tokens > target:
+            dropped.append(self.messages[self.start_index])
+            self._window_tokens -= self._token_counts[self.start_index]
+            self.start_index += 1
+
+        if dropped and self.summarize and client is not None:
+            self._update_summary(client, dropped)
+
+    def _update_summary(self, client, dropped):
+        """Intègre les messages retirés dans le résumé glissant"""
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in dropped)
+        if self.summary:
+            transcript = f"Résumé précédent : {self.summary}\n\nNouveaux échanges :\n{transcript}"
+
+        try:
+            response = client.chat.completions.create(
+                model=SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": transcript}
+                ],
+                max_tokens=300,
+                temperature=0
+            )
+        except Exception:
+            # Le résumé est facultatif : les messages sont simplement retirés
+            return
+
+        self.summary = response.choices[0].message.content.strip()
+        self._summary_tokens = count_tokens(self.summary, self.model) + MESSAGE_OVERHEAD_TOKENS
+        self.summarized_messages += len(dropped)
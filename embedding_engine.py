@@ -0,0 +1,281 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from model_registry import get_model_registry
+
+EMBEDDING_BATCH_SIZE = 32
+# Longueur maximale (en tokens) d'un texte, limite de BERT
+EMBEDDING_MAX_LENGTH = 512
+# Nombre d'embeddings gardés en mémoire (LRU)
+EMBEDDING_CACHE_MAX_ENTRIES = 10_000
+
+
+def text_key(text):
+    """Identifiant d'un texte : empreinte SHA-256 de son contenu"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def mean_pool(last_hidden_state, attention_mask):
+    """Moyenne des états cachés sur les seuls tokens réels (le padding est ignoré)"""
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    return (last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+
+
+class EmbeddingStore:
+    """
+    Matrice d'embeddings float32 persistée sur disque, avec un index des identifiants
+
+    Les vecteurs sont ajoutés à la fin de vectors.f32 et relus par projection mémoire
+    (np.memmap) : la matrice n'est jamais chargée en entier. ids.txt contient un
+    identifiant par ligne, dans l'ordre des lignes de la matrice.
+    """
+
+    def __init__(self, directory, dim=None):
+        self.directory = directory
+        self.dim = dim
+        self._ids = {}
+        self._matrix = None
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._ids_path = os.path.join(directory, "ids.txt")
+        self._meta_path = os.path.join(directory, "meta.json")
+
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, encoding="utf-8") as file:
+                self.dim = json.load(file)["dim"]
+        if os.path.exists(self._ids_path):
+            with open(self._ids_path, encoding="utf-8") as file:
+                ids = file.read().splitlines()
+            vector_bytes = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+            if self.dim is None and ids:
+                self.dim = self._infer_dim(len(ids), vector_bytes)
+            rows = vector_bytes // (4 * self.dim) if self.dim else 0
+            self._ids = {identifier: row for row, identifier in enumerate(ids[:rows])}
+            # Une écriture interrompue peut laisser des vecteurs incomplets ou des identifiants en trop
+            if len(ids) != len(self._ids) or vector_bytes != len(self._ids) * 4 * (self.dim or 0):
+                self._truncate()
+        self._remap()
+
+    def _infer_dim(self, count, vector_bytes):
+        """Retrouve la dimension quand meta.json manque, sans jamais tronquer les fichiers"""
+        if vector_bytes == 0 or vector_bytes % (4 * count):
+            raise ValueError(
+                f"Dimension inconnue pour le store {self.directory} : meta.json est absent et "
+                f"ne peut pas être déduit de {vector_bytes} octets pour {count} identifiants"
+            )
+        dim = vector_bytes // (4 * count)
+        with open(self._meta_path, "w", encoding="utf-8") as file:
+            json.dump({"dim": dim}, file)
+        return dim
+
+    def _truncate(self):
+        """Ramène les fichiers aux lignes complètes de l'index"""
+        with open(self._vectors_path, "ab") as file:
+            file.truncate(len(self._ids) * 4 * (self.dim or 0))
+        with open(self._ids_path, "w", encoding="utf-8") as file:
+            file.writelines(f"{identifier}\n" for identifier in self._ids)
+
+    def _remap(self):
+        rows = len(self._ids)
+        self._matrix = (
+            np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            if rows else None
+        )
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, identifier):
+        return identifier in self._ids
+
+    @property
+    def matrix(self):
+        """Matrice (lignes, dim) projetée en mémoire, en lecture seule"""
+        with self._lock:
+            if self._matrix is None:
+                return np.empty((0, self.dim or 0), dtype=np.float32)
+            return self._matrix
+
+    def get(self, identifier):
+        """Retourne le vecteur d'un identifiant, ou None"""
+        with self._lock:
+            row = self._ids.get(identifier)
+            return np.array(self._matrix[row]) if row is not None else None
+
+    def add(self, identifiers, vectors):
+        """Ajoute des vecteurs (les identifiants déjà présents sont ignorés)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self._meta_path, "w", encoding="utf-8") as file:
+                    json.dump({"dim": self.dim}, file)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Dimension {vectors.shape[1]} différente de celle du store ({self.dim})")
+
+            # Première occurrence de chaque identifiant absent du store
+            new_rows = {}
+            for index, identifier in enumerate(identifiers):
+                if identifier not in self._ids:
+                    new_rows.setdefault(identifier, index)
+            new_rows = list(new_rows.values())
+            if not new_rows:
+                return
+
+            with open(self._vectors_path, "ab") as file:
+                file.write(vectors[new_rows].tobytes())
+            with open(self._ids_path, "a", encoding="utf-8") as file:
+                for index in new_rows:
+                    self._ids[identifiers[index]] = len(self._ids)
+                    file.write(f"{identifiers[index]}\n")
+            self._remap()
+
+    def search(self, vector, top_k=5):
+        """
+        Recherche les vecteurs les plus proches (similarité cosinus)
+
+        Returns:
+            list: (identifiant, score), du plus au moins similaire
+        """
+        matrix = self.matrix
+        if not len(matrix):
+            return []
+
+        vector = np.asarray(vector, dtype=np.float32)
+        scores = matrix @ vector
+        scores /= np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector) + 1e-12
+
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+
+        with self._lock:
+            identifiers = list(self._ids)
+        return [(identifiers[row], float(scores[row])) for row in best]
+
+
+class EmbeddingEngine:
+    """
+    Calcul d'embeddings BERT par lots, mis en cache par texte
+
+    Les textes déjà vus sont servis depuis un LRU en mémoire puis depuis le store
+    (s'il est fourni), où chaque nouvel embedding est enregistré sous l'empreinte
+    de son texte. Les autres sont triés par longueur, découpés en lots et moyennés
+    sur leurs seuls tokens réels.
+    """
+
+    def __init__(self, registry=None, store=None, batch_size=EMBEDDING_BATCH_SIZE,
+                 max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        self.models = registry or get_model_registry()
+        self.store = store
+        self.batch_size = batch_size
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                return vector
+        return self.store.get(key) if self.store is not None else None
+
+    def _remember(self, key, vector):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _compute(self, texts):
+        """Calcule les embeddings d'une liste de textes (déjà dédoublonnés)"""
+        import torch
+
+        tokenizer, model = self.models.get('embeddings')
+        order = sorted(range(len(texts)), key=lambda index: len(texts[index]))
+        vectors = np.empty((len(texts), model.config.hidden_size), dtype=np.float32)
+
+        with torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                batch = order[start:start + self.batch_size]
+                inputs = tokenizer(
+                    [texts[index] for index in batch],
+                    padding=True,
+                    truncation=True,
+                    max_length=EMBEDDING_MAX_LENGTH,
+                    return_tensors='pt'
+                )
+                outputs = model(**inputs)
+                pooled = mean_pool(outputs.last_hidden_state, inputs['attention_mask'])
+                vectors[batch] = pooled.float().cpu().numpy()
+
+        return vectors
+
+    def embed(self, texts):
+        """
+        Retourne les embeddings d'une liste de textes
+
+        Returns:
+            np.ndarray: Matrice float32 (nombre de textes, dimension)
+        """
+        texts = list(texts)
+        keys = [text_key(text) for text in texts]
+
+        vectors = {}
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in missing:
+                continue
+            vector = self._cached(key)
+            if vector is None:
+                missing[key] = text
+            else:
+                vectors[key] = vector
+
+        self.hits += len(vectors)
+        self.misses += len(missing)
+
+        if missing:
+            computed = self._compute(list(missing.values()))
+            if self.store is not None:
+                self.store.add(list(missing), computed)
+            for key, vector in zip(missing, computed):
+                vectors[key] = vector
+
+        for key, vector in vectors.items():
+            self._remember(key, vector)
+
+        if not keys:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+
+    def search(self, text, top_k=5):
+        """Recherche dans le store les textes enregistrés les plus proches d'un texte"""
+        if self.store is None:
+            raise ValueError("La recherche nécessite un EmbeddingStore")
+        return self.store.search(self.embed([text])[0], top_k)
+
+    def stats(self):
+        """Retourne les statistiques d'utilisation du cache (même format que DiskCache.stats)"""
+        with self._lock:
+            entries = len(self._entries)
+            total = sum(vector.nbytes for vector in self._entries.values())
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total
+        }
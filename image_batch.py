@@ -0,0 +1,104 @@
+import base64
+import re
+import zipfile
+
+from batch_executor import run_bounded
+
+BATCH_IMAGE_MODEL = "dall-e-3"
+# Nombre maximum d'images demandées en un lot
+MAX_BATCH_IMAGES = 50
+# Débit par défaut, à ajuster selon le palier du compte OpenAI
+DEFAULT_IMAGES_PER_MINUTE = 7
+
+# Styles proposés pour décliner un même prompt
+BATCH_STYLES = {
+    "Photographie réaliste": "photorealistic photograph, natural lighting",
+    "Aquarelle": "watercolor painting, soft washes of color",
+    "Peinture à l'huile": "oil painting, visible brush strokes",
+    "Illustration numérique": "digital illustration, clean lines, vibrant colors",
+    "Rendu 3D": "3D render, studio lighting",
+    "Croquis au crayon": "pencil sketch, detailed shading",
+    "Style anime": "anime style, cel shading",
+    "Art minimaliste": "minimalist flat design, limited palette"
+}
+
+
+def expand_batch_prompts(prompts, styles=None, variants=1):
+    """
+    Construit la liste des images à générer
+
+    Chaque prompt est décliné dans chaque style choisi (ou tel quel sans style),
+    puis répété variants fois : DALL-E 3 n'ayant pas de graine, deux appels
+    identiques donnent deux candidats différents.
+
+    Returns:
+        list: Dictionnaires {"prompt", "style", "full_prompt"}, au plus MAX_BATCH_IMAGES
+    """
+    jobs = []
+    for prompt in prompts:
+        for style in (styles or [None]):
+            full_prompt = f"{prompt}, {BATCH_STYLES[style]}" if style else prompt
+            for _ in range(variants):
+                jobs.append({"prompt": prompt, "style": style, "full_prompt": full_prompt})
+
+    return jobs[:MAX_BATCH_IMAGES]
+
+
+def generate_image_bytes(client, prompt, size="1024x1024", quality="standard"):
+    """Génère une image DALL-E 3 et retourne ses données PNG (reçues en base64, sans téléchargement)"""
+    response = client.images.generate(
+        model=BATCH_IMAGE_MODEL,
+        prompt=prompt,
+        size=size,
+        quality=quality,
+        n=1,
+        response_format="b64_json"
+    )
+    return base64.b64decode(response.data[0].b64_json)
+
+
+def generate_image_batch(client, jobs, size="1024x1024", quality="standard", max_workers=4,
+                         images_per_minute=DEFAULT_IMAGES_PER_MINUTE):
+    """
+    Génère un lot d'images en parallèle, dans la limite de débit du compte
+
+    Args:
+        client: Client OpenAI initialisé
+        jobs: Liste construite par expand_batch_prompts
+        size: Taille des images
+        quality: Qualité des images (standard ou hd)
+        max_workers: Nombre de générations simultanées
+        images_per_minute: Débit maximum (None pour ne pas limiter)
+
+    Yields:
+        tuple: (index du job, données PNG ou None, exception ou None), dans l'ordre de terminaison
+    """
+    def generate(job):
+        return generate_image_bytes(client, job["full_prompt"], size=size, quality=quality)
+
+    yield from run_bounded(
+        generate,
+        jobs,
+        max_workers=max_workers,
+        requests_per_minute=images_per_minute
+    )
+
+
+def write_batch_zip(file, jobs, images):
+    """
+    Écrit les images d'un lot dans une archive ZIP
+
+    Args:
+        file: Fichier (ou buffer) ouvert en écriture binaire
+        jobs: Liste des jobs du lot
+        images: Données PNG de chaque job, dans l'ordre (itérable lu au fur et à mesure,
+            None pour les échecs)
+    """
+    # Les PNG sont déjà compressés : les stocker tels quels évite un travail inutile
+    with zipfile.ZipFile(file, "w", compression=zipfile.ZIP_STORED) as archive:
+        for index, (job, image_data) in enumerate(zip(jobs, images), start=1):
+            if image_data is None:
+                continue
+            slug = re.sub(r"[^a-z0-9]+", "-", job["full_prompt"].lower()).strip("-")[:40]
+            archive.writestr(f"{index:02d}-{slug or 'image'}.png", image_data)
+
@@ -0,0 +1,102 @@
+import base64
+import time
+from io import BytesIO
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Délais (connexion, lecture) en secondes
+IMAGE_FETCH_TIMEOUT = (5, 60)
+# Nombre de tentatives lorsque le transfert est interrompu en cours de lecture
+IMAGE_FETCH_ATTEMPTS = 3
+IMAGE_FETCH_BACKOFF = 0.5
+READ_CHUNK_BYTES = 64 * 1024
+
+
+@st.cache_resource(show_spinner=False)
+def get_image_session():
+    """
+    Crée la session HTTP partagée pour télécharger les images générées
+
+    Les connexions keep-alive sont réutilisées d'un téléchargement à l'autre et
+    les erreurs de connexion ou réponses 429/5xx sont retentées avec un délai croissant.
+    """
+    retry = Retry(
+        total=3,
+        backoff_factor=IMAGE_FETCH_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"])
+    )
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _read_body(response):
+    """Lit le corps de la réponse par blocs, dans un buffer préalloué si la taille est connue"""
+    content_length = response.headers.get("Content-Length")
+    if content_length is None or response.headers.get("Content-Encoding"):
+        buffer = BytesIO()
+        for chunk in response.iter_content(READ_CHUNK_BYTES):
+            buffer.write(chunk)
+        buffer.seek(0)
+        return buffer
+
+    data = bytearray(int(content_length))
+    view = memoryview(data)
+    offset = 0
+    raw = response.raw
+    while offset < len(data):
+        read = raw.readinto(view[offset:])
+        if not read:
+            raise requests.exceptions.ChunkedEncodingError(
+                f"Transfert interrompu ({offset}/{len(data)} octets reçus)"
+            )
+        offset += read
+
+    return BytesIO(data)
+
+
+def fetch_image_bytes(url, timeout=IMAGE_FETCH_TIMEOUT):
+    """
+    Télécharge une image via la session partagée
+
+    Args:
+        url: URL de l'image
+        timeout: Délais (connexion, lecture) en secondes
+
+    Returns:
+        BytesIO: Contenu de l'image, positionné au début
+    """
+    session = get_image_session()
+
+    for attempt in range(IMAGE_FETCH_ATTEMPTS):
+        try:
+            with session.get(url, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                return _read_body(response)
+        except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ReadTimeout):
+            if attempt == IMAGE_FETCH_ATTEMPTS - 1:
+                raise
+            time.sleep(IMAGE_FETCH_BACKOFF * 2 ** attempt)
+
+
+def image_bytes_from_result(image_result):
+    """
+    Retourne le contenu d'une image renvoyée par l'API Images
+
+    Avec response_format="b64_json", l'image est incluse dans la réponse et aucun
+    second appel HTTP n'est nécessaire ; sinon elle est téléchargée depuis son URL.
+
+    Returns:
+        BytesIO: Contenu de l'image, positionné au début
+    """
+    if getattr(image_result, "b64_json", None):
+        return BytesIO(base64.b64decode(image_result.b64_json))
+
+    return fetch_image_bytes(image_result.url)
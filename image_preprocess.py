@@ -0,0 +1,209 @@
+from functools import lru_cache
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+# Tailles carrées acceptées par les API de variation et d'édition (DALL-E 2)
+VALID_EDIT_SIZES = (256, 512, 1024)
+# Taille maximale d'un fichier envoyé à ces API
+MAX_UPLOAD_BYTES = 4 * 1024 * 1024
+# Niveaux de compression PNG essayés, du plus rapide au plus compact
+PNG_COMPRESS_LEVELS = (6, 9)
+
+
+def open_image(image_file):
+    """Retourne une image PIL à partir d'un fichier uploadé ou d'une image PIL"""
+    if hasattr(image_file, "read"):
+        # Si c'est un fichier uploadé par Streamlit
+        image_file.seek(0)
+        return Image.open(image_file)
+    return image_file
+
+
+def target_edit_size(image_size):
+    """Choisit la plus petite taille valide contenant l'image"""
+    longest = max(image_size)
+    for size in VALID_EDIT_SIZES:
+        if longest <= size:
+            return size
+    return VALID_EDIT_SIZES[-1]
+
+
+def letterbox_geometry(image_size, size):
+    """
+    Calcule la taille réduite et la position d'une image centrée dans un carré
+
+    Returns:
+        tuple: ((largeur, hauteur), (x, y)) de l'image dans le carré de côté size
+    """
+    width, height = image_size
+    scale = min(1.0, size / max(width, height))
+    if scale < 1.0:
+        width, height = max(1, round(width * scale)), max(1, round(height * scale))
+    return (width, height), ((size - width) // 2, (size - height) // 2)
+
+
+def normalize_image(image, size=None):
+    """
+    Convertit une image en RGB carré de taille valide, en une seule passe
+
+    L'image est réduite (jamais agrandie) puis collée au centre d'un fond blanc :
+    la transparence est aplatie par le même collage, sans image intermédiaire.
+    Une image RGB déjà à une taille valide est retournée telle quelle.
+
+    Args:
+        image: Image PIL
+        size: Côté du carré cible (par défaut, la plus petite taille valide)
+
+    Returns:
+        Image: Image RGB de size × size pixels
+    """
+    if size is None:
+        size = target_edit_size(image.size)
+
+    if image.size == (size, size) and image.mode == "RGB":
+        return image
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    source = image.convert("RGBA" if has_alpha else "RGB") if image.mode not in ("RGBA", "RGB") else image
+
+    new_size, offset = letterbox_geometry(source.size, size)
+    if new_size != source.size:
+        source = source.resize(new_size, Image.Resampling.LANCZOS)
+
+    canvas = Image.new("RGB", (size, size), (255, 255, 255))
+    canvas.paste(source, offset, mask=source if source.mode == "RGBA" else None)
+    return canvas
+
+
+def encode_png(image, compress_level=6, name="image.png"):
+    """Encode une image en PNG dans un buffer nommé, prêt à être envoyé à l'API"""
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=compress_level)
+    buffer.seek(0)
+    buffer.name = name
+    return buffer
+
+
+def prepare_edit_image(image_file, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Prépare une image pour les API de variation et d'édition
+
+    L'image est normalisée puis encodée une seule fois par tentative ; le même
+    buffer sert au contrôle de taille et à l'envoi. Si le PNG dépasse max_bytes,
+    une compression plus forte est essayée, puis la taille valide inférieure.
+
+    Args:
+        image_file: Fichier uploadé ou image PIL
+        max_bytes: Taille maximale du fichier encodé
+
+    Returns:
+        tuple: (buffer PNG, côté de l'image en pixels)
+
+    Raises:
+        ValueError: Si l'image dépasse max_bytes même à la plus petite taille
+    """
+    image = open_image(image_file)
+    size = target_edit_size(image.size)
+
+    for candidate_size in reversed([s for s in VALID_EDIT_SIZES if s <= size]):
+        normalized = normalize_image(image, candidate_size)
+        for compress_level in PNG_COMPRESS_LEVELS:
+            buffer = encode_png(normalized, compress_level)
+            if buffer.getbuffer().nbytes <= max_bytes:
+                return buffer, candidate_size
+
+    raise ValueError(f"L'image dépasse {max_bytes // (1024 * 1024)} Mo même après réduction.")
+
+
+def _encode_mask(alpha):
+    """Encode un masque (tableau alpha uint8, 0 = zone à modifier) en PNG RGBA"""
+    rgba = np.zeros(alpha.shape + (4,), dtype=np.uint8)
+    rgba[..., 3] = alpha
+    return encode_png(Image.fromarray(rgba)).getvalue()
+
+
+# Masques entièrement transparents (édition de toute l'image), encodés une fois pour toutes
+TRANSPARENT_MASKS = {
+    size: _encode_mask(np.zeros((size, size), dtype=np.uint8))
+    for size in VALID_EDIT_SIZES
+}
+
+
+@lru_cache(maxsize=32)
+def compile_box_mask(box, image_size, size):
+    """
+    Compile un masque rectangulaire aligné sur l'image normalisée
+
+    Args:
+        box: Zone à modifier (x0, y0, x1, y1), en fractions de l'image d'origine
+        image_size: Taille (largeur, hauteur) de l'image d'origine
+        size: Côté de l'image normalisée
+
+    Returns:
+        bytes: Masque PNG (zone transparente = zone modifiée par l'API)
+    """
+    (width, height), (left, top) = letterbox_geometry(image_size, size)
+    x0, y0, x1, y1 = box
+
+    alpha = np.full((size, size), 255, dtype=np.uint8)
+    alpha[
+        top + round(y0 * height):top + round(y1 * height),
+        left + round(x0 * width):left + round(x1 * width)
+    ] = 0
+    return _encode_mask(alpha)
+
+
+@lru_cache(maxsize=16)
+def compile_mask_image(mask_data, image_size, size):
+    """
+    Compile un masque dessiné par l'utilisateur, aligné sur l'image normalisée
+
+    Le masque a les dimensions de l'image d'origine. S'il possède un canal alpha,
+    les zones transparentes sont modifiées ; sinon ce sont les zones claires.
+
+    Args:
+        mask_data: Contenu du fichier de masque
+        image_size: Taille (largeur, hauteur) de l'image d'origine
+        size: Côté de l'image normalisée
+
+    Returns:
+        bytes: Masque PNG (zone transparente = zone modifiée par l'API)
+    """
+    mask = Image.open(BytesIO(mask_data))
+    if mask.mode in ("RGBA", "LA") or (mask.mode == "P" and "transparency" in mask.info):
+        alpha = mask.convert("RGBA").getchannel("A")
+    else:
+        alpha = mask.convert("L").point(lambda value: 0 if value > 127 else 255)
+
+    new_size, offset = letterbox_geometry(image_size, size)
+    canvas = Image.new("L", (size, size), 255)
+    canvas.paste(alpha.resize(new_size, Image.Resampling.NEAREST), offset)
+    return _encode_mask(np.asarray(canvas))
+
+
+def prepare_edit_mask(size, region=None, image_size=None):
+    """
+    Retourne le masque à envoyer à l'API d'édition, sans réencodage
+
+    Args:
+        size: Côté de l'image normalisée
+        region: None pour toute l'image, un tuple (x0, y0, x1, y1) en fractions,
+            ou le contenu (bytes) d'un masque dessiné par l'utilisateur
+        image_size: Taille de l'image d'origine (requise avec region)
+
+    Returns:
+        BytesIO: Masque PNG nommé mask.png
+    """
+    if region is None:
+        data = TRANSPARENT_MASKS[size]
+    elif isinstance(region, bytes):
+        data = compile_mask_image(region, tuple(image_size), size)
+    else:
+        data = compile_box_mask(tuple(region), tuple(image_size), size)
+
+    # BytesIO partage les octets tant qu'ils ne sont pas modifiés : aucune copie
+    buffer = BytesIO(data)
+    buffer.name = "mask.png"
+    return buffer
@@ -0,0 +1,155 @@
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+# Mémoire maximale occupée par les modèles chargés (surchargeable par variable d'environnement)
+MODEL_MEMORY_BUDGET_BYTES = int(os.environ.get("POE_MODEL_MEMORY_BUDGET", 4 * 1024 ** 3))
+
+EMBEDDING_MODEL = 'bert-base-uncased'
+GENERATION_MODEL = 'gpt2'
+
+
+def _pipeline_loader(task, **kwargs):
+    """Chargeur d'un pipeline transformers (importé seulement au premier chargement)"""
+    def load():
+        from transformers import pipeline
+        return pipeline(task, **kwargs)
+    return load
+
+
+def _load_bert():
+    from transformers import BertModel, BertTokenizer
+    tokenizer = BertTokenizer.from_pretrained(EMBEDDING_MODEL)
+    model = BertModel.from_pretrained(EMBEDDING_MODEL)
+    model.eval()
+    return tokenizer, model
+
+
+# Modèles utilisés par TextProcessor
+DEFAULT_MODELS = {
+    'translation': _pipeline_loader("translation_en_to_fr"),
+    'ner': _pipeline_loader("ner", aggregation_strategy="simple"),
+    'sentiment': _pipeline_loader("sentiment-analysis"),
+    'embeddings': _load_bert,
+    'generation': _pipeline_loader("text-generation", model=GENERATION_MODEL)
+}
+
+
+def model_size(model) -> int:
+    """Estime la mémoire occupée par un modèle (poids et buffers), pipeline ou tuple compris"""
+    if isinstance(model, (tuple, list)):
+        return sum(model_size(item) for item in model)
+
+    # Un pipeline expose son modèle dans l'attribut model
+    module = getattr(model, 'model', model)
+    if not hasattr(module, 'parameters'):
+        return 0
+
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+class ModelRegistry:
+    """
+    Registre des modèles chargés une seule fois et partagés entre les appels et les threads
+
+    Chaque modèle est chargé à sa première utilisation (ou par warmup) puis réutilisé.
+    Au-delà de budget_bytes, les modèles les moins récemment utilisés sont libérés ;
+    ils seront rechargés à la demande.
+    """
+
+    def __init__(self, loaders=None, budget_bytes=MODEL_MEMORY_BUDGET_BYTES):
+        self.loaders = dict(DEFAULT_MODELS if loaders is None else loaders)
+        self.budget_bytes = budget_bytes
+
+        # Modèles chargés, du moins au plus récemment utilisé
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._load_times = {}
+        self._lock = threading.Lock()
+        # Un verrou par modèle : deux threads ne chargent jamais le même modèle en double
+        self._load_locks = {}
+
+    def register(self, name, loader):
+        """Déclare un modèle et la fonction qui le charge"""
+        with self._lock:
+            self.loaders[name] = loader
+
+    def get(self, name):
+        """Retourne un modèle, chargé au premier appel"""
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+            if name not in self.loaders:
+                raise KeyError(f"Modèle inconnu : {name}")
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                if name in self._models:
+                    self._models.move_to_end(name)
+                    return self._models[name]
+
+            start = time.perf_counter()
+            model = self.loaders[name]()
+            load_time = time.perf_counter() - start
+            size = model_size(model)
+
+            with self._lock:
+                self._models[name] = model
+                self._sizes[name] = size
+                self._load_times[name] = load_time
+                self._evict(keep=name)
+
+        return model
+
+    def warmup(self, *names):
+        """Charge à l'avance les modèles indiqués (tous par défaut)"""
+        for name in names or list(self.loaders):
+            self.get(name)
+
+    def _evict(self, keep=None):
+        """Libère les modèles les moins récemment utilisés au-delà du budget mémoire"""
+        evicted = False
+        while sum(self._sizes.values()) > self.budget_bytes:
+            name = next((loaded for loaded in self._models if loaded != keep), None)
+            if name is None:
+                break
+            del self._models[name]
+            del self._sizes[name]
+            evicted = True
+
+        if evicted:
+            gc.collect()
+
+    def evict(self, name=None):
+        """Libère un modèle (tous par défaut)"""
+        with self._lock:
+            names = [name] if name is not None else list(self._models)
+            for loaded in names:
+                self._models.pop(loaded, None)
+                self._sizes.pop(loaded, None)
+        gc.collect()
+
+    def stats(self):
+        """
+        Retourne l'état des modèles chargés
+
+        Returns:
+            dict: Pour chaque modèle chargé, {"bytes", "load_seconds"}, du moins au plus récemment utilisé
+        """
+        with self._lock:
+            return {
+                name: {"bytes": self._sizes[name], "load_seconds": self._load_times[name]}
+                for name in self._models
+            }
+
+
+@lru_cache(maxsize=None)
+def get_model_registry() -> ModelRegistry:
+    """Retourne le registre de modèles partagé par tout le processus"""
+    return ModelRegistry()
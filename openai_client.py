@@ -0,0 +1,66 @@
+import hashlib
+
+import httpx
+import streamlit as st
+from openai import DefaultHttpxClient, OpenAI
+
+# Durée de vie d'un client validé dans le cache (en secondes)
+CLIENT_TTL_SECONDS = 3600
+# Nombre maximum de clés API conservées simultanément
+MAX_CACHED_CLIENTS = 64
+
+
+@st.cache_resource(show_spinner=False)
+def get_http_client():
+    """Crée le pool de connexions HTTP partagé par tous les clients OpenAI de l'application"""
+    return DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=30.0
+        ),
+        timeout=httpx.Timeout(60.0, connect=5.0)
+    )
+
+
+def hash_api_key(api_key):
+    """Retourne l'empreinte SHA-256 d'une clé API (la clé elle-même n'est jamais utilisée comme clé de cache)"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+@st.cache_resource(ttl=CLIENT_TTL_SECONDS, max_entries=MAX_CACHED_CLIENTS, show_spinner=False)
+def _get_validated_client(api_key_hash, _api_key):
+    """
+    Construit et valide un client OpenAI une seule fois par clé API
+
+    Le paramètre _api_key est préfixé par un underscore pour être exclu du hachage
+    de Streamlit : seule l'empreinte api_key_hash sert de clé de cache. Une exception
+    levée ici n'est pas mise en cache, une clé invalide sera donc revalidée au prochain essai.
+    """
+    client = OpenAI(api_key=_api_key, http_client=get_http_client())
+
+    # Validation peu coûteuse et non facturée de la clé
+    client.models.list()
+
+    return client
+
+
+def initialize_openai_client(api_key):
+    """Initialise le client OpenAI avec la clé API fournie par l'utilisateur"""
+    try:
+        if not api_key:
+            return None
+
+        if not api_key.startswith('sk-'):
+            st.error("❌ Format de clé API invalide. La clé doit commencer par 'sk-'")
+            return None
+
+        try:
+            return _get_validated_client(hash_api_key(api_key), api_key)
+        except Exception as e:
+            st.error(f"❌ Clé API invalide ou problème de connexion: {str(e)}")
+            return None
+
+    except Exception as e:
+        st.error(f"❌ Erreur lors de l'initialisation du client OpenAI: {str(e)}")
+        return None
@@ -0,0 +1,145 @@
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import streamlit as st
+from PIL import Image
+
+# Distance de Hamming maximale (sur 64 bits) pour considérer deux images comme identiques
+DEFAULT_HAMMING_THRESHOLD = 5
+PERCEPTUAL_CACHE_MAX_ENTRIES = 512
+
+HASH_SIZE = 8
+# pHash : DCT calculée sur une vignette de 32 × 32 pixels
+PHASH_IMAGE_SIZE = HASH_SIZE * 4
+
+
+def _dct_matrix(size):
+    """Matrice de la DCT-II orthonormée de taille size × size"""
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.sqrt(2.0 / size) * np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(PHASH_IMAGE_SIZE)
+
+
+def _bits_to_int(bits):
+    """Convertit un tableau de booléens en entier (bit de poids fort en premier)"""
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def _grayscale(image, size):
+    """Vignette en niveaux de gris, sous forme de tableau float32"""
+    return np.asarray(image.convert("L").resize(size, Image.Resampling.LANCZOS), dtype=np.float32)
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """Empreinte par différence : compare chaque pixel à son voisin de droite"""
+    pixels = _grayscale(image, (hash_size + 1, hash_size))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image, hash_size=HASH_SIZE):
+    """Empreinte perceptuelle : signe des basses fréquences de la DCT par rapport à leur médiane"""
+    pixels = _grayscale(image, (PHASH_IMAGE_SIZE, PHASH_IMAGE_SIZE))
+    low_frequencies = (_DCT @ pixels @ _DCT.T)[:hash_size, :hash_size]
+    return _bits_to_int(low_frequencies > np.median(low_frequencies))
+
+
+def hamming_distance(first, second):
+    """Nombre de bits différents entre deux empreintes"""
+    return bin(first ^ second).count("1")
+
+
+HASH_FUNCTIONS = {
+    "phash": phash,
+    "dhash": dhash
+}
+
+
+class PerceptualCache:
+    """
+    Cache en mémoire de résultats indexés par l'empreinte perceptuelle d'une image
+
+    Une image est retrouvée si son empreinte est à moins de threshold bits d'une
+    empreinte connue pour le même espace de noms (type d'analyse, niveau de détail...) :
+    une image réenregistrée, recompressée ou légèrement redimensionnée sert
+    directement le résultat déjà obtenu. Les entrées les moins récemment utilisées
+    sont évincées au-delà de max_entries.
+    """
+
+    def __init__(self, max_entries=PERCEPTUAL_CACHE_MAX_ENTRIES, threshold=DEFAULT_HAMMING_THRESHOLD, hash_function="phash"):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hash_function = HASH_FUNCTIONS[hash_function]
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def image_hash(self, image):
+        """Calcule l'empreinte d'une image PIL"""
+        return self.hash_function(image)
+
+    def get(self, image_hash, namespace, threshold=None):
+        """Retourne le résultat de l'empreinte connue la plus proche, ou None"""
+        threshold = self.threshold if threshold is None else threshold
+
+        with self._lock:
+            best_key, best_distance = None, threshold + 1
+            for key in self._entries:
+                if key[0] != namespace:
+                    continue
+                distance = hamming_distance(key[1], image_hash)
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+                    if distance == 0:
+                        break
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key]
+
+    def set(self, image_hash, namespace, value):
+        """Enregistre un résultat puis évince les entrées les plus anciennes si nécessaire"""
+        with self._lock:
+            self._entries[(namespace, image_hash)] = value
+            self._entries.move_to_end((namespace, image_hash))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Vide le cache et remet les compteurs à zéro"""
+        with self._lock:
+            self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Retourne les statistiques d'utilisation du cache (même format que DiskCache.stats)"""
+        with self._lock:
+            entries = len(self._entries)
+            total = sum(len(json.dumps(value, ensure_ascii=False)) for value in self._entries.values())
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total
+        }
+
+
+@st.cache_resource(show_spinner=False)
+def get_perceptual_cache():
+    """Retourne le cache perceptuel des analyses d'images, partagé par toutes les pages"""
+    return PerceptualCache()
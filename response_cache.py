@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+# Dossier des caches persistants de l'application (surchargeable par variable d'environnement)
+CACHE_DIR = os.environ.get(
+    "POE_OPENAI_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "poe-openai")
+)
+
+# Taille maximale du cache de réponses textuelles
+RESPONSE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+
+
+class DiskCache:
+    """
+    Cache clé/valeur persistant stocké dans une base SQLite
+
+    Les valeurs sont des bytes. Lorsque la taille totale dépasse max_bytes,
+    les entrées les moins récemment lues sont supprimées (LRU). Les compteurs
+    de hits/misses sont propres au processus.
+    """
+
+    def __init__(self, path, max_bytes=RESPONSE_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Une seule connexion partagée entre les threads de Streamlit, protégée par un verrou
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+
+    def get(self, key):
+        """Retourne la valeur associée à la clé, ou None si elle est absente"""
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error:
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return row[0]
+
+    def set(self, key, value):
+        """Enregistre une valeur puis évince les entrées les plus anciennes si nécessaire"""
+        if len(value) > self.max_bytes:
+            return
+
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, sqlite3.Binary(value), len(value), time.time())
+                )
+                self._evict()
+        except sqlite3.Error:
+            # Le cache est une optimisation : une erreur d'écriture n'interrompt pas l'appel
+            pass
+
+    def delete(self, key):
+        """Supprime une entrée (par exemple une réponse devenue invalide)"""
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+        except sqlite3.Error:
+            pass
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées jusqu'à respecter max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            stale_keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", stale_keys)
+
+    def clear(self):
+        """Vide le cache et remet les compteurs à zéro"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Retourne les statistiques d'utilisation du cache"""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total
+        }
+
+
+def make_cache_key(model, messages, **params):
+    """Construit une clé de cache déterministe à partir du modèle, des messages et des paramètres"""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    """Retourne le cache de réponses partagé par toutes les pages"""
+    return DiskCache(os.path.join(CACHE_DIR, "responses.sqlite3"), RESPONSE_CACHE_MAX_BYTES)
+
+
+def cached_chat_completion(client, model, messages, use_cache=True, cache=None, validate=None, **params):
+    """
+    Appelle client.chat.completions.create en réutilisant les réponses déjà obtenues
+
+    Args:
+        client: Client OpenAI initialisé
+        model: Modèle à utiliser
+        messages: Messages de la requête
+        use_cache: Mettre à False pour forcer un nouvel appel, par exemple pour obtenir
+            une nouvelle variante avec une température non nulle
+        cache: Cache à utiliser (par défaut le cache partagé, à passer explicitement
+            depuis un thread de travail)
+        validate: Fonction appelée avec le contenu avant sa mise en cache ; si elle lève
+            une exception, la réponse n'est pas enregistrée (et une entrée déjà en cache
+            qui ne passe pas la validation est supprimée puis redemandée)
+        **params: Autres paramètres de l'API (max_tokens, temperature...)
+
+    Returns:
+        str: Contenu de la réponse
+    """
+    if cache is None:
+        cache = get_response_cache()
+    key = make_cache_key(model, messages, **params)
+
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            content = json.loads(cached)["content"]
+            try:
+                if validate is not None:
+                    validate(content)
+                return content
+            except Exception:
+                cache.delete(key)
+
+    response = client.chat.completions.create(model=model, messages=messages, **params)
+    choice = response.choices[0]
+    content = choice.message.content
+
+    if validate is not None:
+        if choice.finish_reason == "length":
+            raise ValueError("Réponse tronquée : la limite de tokens a été atteinte")
+        validate(content)
+
+    # La réponse est enregistrée même sans lecture du cache, pour les appels suivants
+    cache.set(key, json.dumps({"content": content}, ensure_ascii=False).encode("utf-8"))
+
+    return content
+
+
+async def cached_chat_completion_async(client, model, messages, use_cache=True, **params):
+    """
+    Équivalent de cached_chat_completion pour un client AsyncOpenAI
+
+    Les lectures et écritures SQLite sont exécutées dans un thread, pour ne pas
+    bloquer la boucle d'événements pendant que d'autres requêtes sont en cours.
+    """
+    cache = get_response_cache()
+    key = make_cache_key(model, messages, **params)
+
+    if use_cache:
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return json.loads(cached)["content"]
+
+    response = await client.chat.completions.create(model=model, messages=messages, **params)
+    content = response.choices[0].message.content
+
+    await asyncio.to_thread(cache.set, key, json.dumps({"content": content}, ensure_ascii=False).encode("utf-8"))
+
+    return content
+
+
+def show_cache_stats(cache, label="Cache"):
+    """Affiche les statistiques d'un cache dans la page courante"""
+    stats = cache.stats()
+    st.caption(
+        f"💾 {label} : {stats['hits']} hit(s) / {stats['misses']} miss(es) "
+        f"({stats['hit_rate']:.0%}) · {stats['entries']} entrée(s), {stats['bytes'] / 1024:.0f} Ko"
+    )
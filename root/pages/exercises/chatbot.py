@@ -1,6 +1,8 @@
 import streamlit as st
 import os
-from openai import OpenAI
+import time
+from openai_client import initialize_openai_client
+from chat_history import ConversationWindow, count_message_tokens
 
 # Configuration de la page
 st.set_page_config(
@@ -13,65 +15,120 @@ st.set_page_config(
 st.title("🤖 Chatbot OpenAI")
 st.markdown("---")
 
-# Configuration de l'API OpenAI avec saisie utilisateur
-def initialize_openai_client(api_key):
-    """Initialise le client OpenAI avec la clé API fournie par l'utilisateur"""
-    try:
-        if not api_key:
-            return None
-        
-        if not api_key.startswith('sk-'):
-            st.error("❌ Format de clé API invalide. La clé doit commencer par 'sk-'")
-            return None
-        
-        # Initialisation du client OpenAI
-        client = OpenAI(api_key=api_key)
-        
-        # Test de validation de la clé API
-        try:
-            # Test simple pour vérifier si la clé fonctionne
-            test_response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "test"}],
-                max_tokens=1
-            )
-            return client
-        except Exception as e:
-            st.error(f"❌ Clé API invalide ou problème de connexion: {str(e)}")
-            return None
-            
-    except Exception as e:
-        st.error(f"❌ Erreur lors de l'initialisation du client OpenAI: {str(e)}")
-        return None
+# Paramètres du modèle de conversation
+CHAT_MODEL = "gpt-3.5-turbo"
+SYSTEM_PROMPT = "Tu es un assistant IA serviable et amical. Réponds de manière claire et concise."
+
+def build_messages(user_input, conversation_history):
+    """Prépare la liste des messages envoyés à l'API (système + historique + nouveau message)"""
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT}
+    ]
+    
+    # Ajout de l'historique de conversation
+    for message in conversation_history:
+        messages.append(message)
+    
+    # Ajout du nouveau message utilisateur
+    messages.append({"role": "user", "content": user_input})
+    
+    return messages
 
 # Fonction pour envoyer une requête au chatbot
-def get_chatbot_response(client, user_input, conversation_history):
+def get_chatbot_response(client, user_input, conversation_history, stats=None):
     """Génère une réponse du chatbot"""
     try:
-        # Préparation des messages avec l'historique
-        messages = [
-            {"role": "system", "content": "Tu es un assistant IA serviable et amical. Réponds de manière claire et concise."}
-        ]
-        
-        # Ajout de l'historique de conversation
-        for message in conversation_history:
-            messages.append(message)
-        
-        # Ajout du nouveau message utilisateur
-        messages.append({"role": "user", "content": user_input})
+        messages = build_messages(user_input, conversation_history)
         
         # Appel à l'API OpenAI
+        start_time = time.perf_counter()
         response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
+            model=CHAT_MODEL,
             messages=messages,
             max_tokens=500,
             temperature=0.7
         )
+        elapsed = time.perf_counter() - start_time
+        
+        # Sans streaming, le premier token arrive avec la réponse complète
+        if stats is not None:
+            tokens = response.usage.completion_tokens if response.usage else 0
+            stats.update({
+                "ttft": elapsed,
+                "total_time": elapsed,
+                "tokens": tokens,
+                "tokens_per_second": tokens / elapsed if elapsed > 0 else 0.0,
+                "streaming": False
+            })
         
         return response.choices[0].message.content
     
     except Exception as e:
-        return f"❌ Erreur lors de la génération de la réponse: {str(e)}"
+        st.error(f"❌ Erreur lors de la génération de la réponse: {str(e)}")
+        return None
+
+def stream_chatbot_response(client, user_input, conversation_history, stats=None):
+    """
+    Génère une réponse du chatbot morceau par morceau (à passer à st.write_stream)
+    
+    Args:
+        client: Client OpenAI initialisé
+        user_input: Message de l'utilisateur
+        conversation_history: Historique des messages précédents
+        stats: Dictionnaire optionnel rempli avec le temps avant le premier token (ttft)
+            et le débit en tokens/seconde une fois le flux terminé
+    
+    Yields:
+        str: Fragments de texte au fur et à mesure de leur réception
+
+    Raises:
+        Exception: Les erreurs de l'API (y compris en cours de flux) sont propagées,
+            pour ne pas enregistrer un message d'erreur comme réponse de l'assistant
+    """
+    messages = build_messages(user_input, conversation_history)
+    
+    start_time = time.perf_counter()
+    first_token_time = None
+    chunk_count = 0
+    completion_tokens = None
+    
+    stream = client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=messages,
+        max_tokens=500,
+        temperature=0.7,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    
+    for chunk in stream:
+        # Le dernier morceau ne contient que l'usage (aucun choix)
+        if chunk.usage:
+            completion_tokens = chunk.usage.completion_tokens
+        
+        if not chunk.choices:
+            continue
+        
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if first_token_time is None:
+                first_token_time = time.perf_counter()
+            chunk_count += 1
+            yield delta
+    
+    end_time = time.perf_counter()
+    
+    if stats is not None and first_token_time is not None:
+        # Un morceau correspond en pratique à un token si l'usage n'est pas renvoyé
+        tokens = completion_tokens if completion_tokens is not None else chunk_count
+        generation_time = end_time - first_token_time
+        stats.update({
+            "ttft": first_token_time - start_time,
+            "total_time": end_time - start_time,
+            "tokens": tokens,
+            "tokens_per_second": tokens / generation_time if generation_time > 0 else 0.0,
+            "streaming": True
+        })
 
 # Section de saisie de la clé API
 st.subheader("🔑 Configuration de l'API OpenAI")
@@ -109,7 +166,7 @@ if api_key:
 
 # Initialisation de l'état de session pour l'historique
 if "conversation_history" not in st.session_state:
-    st.session_state.conversation_history = []
+    st.session_state.conversation_history = ConversationWindow(model=CHAT_MODEL)
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -126,9 +183,35 @@ if client:
 
     with col2:
         if st.button("🗑️ Effacer la conversation", use_container_width=True):
-            st.session_state.conversation_history = []
+            st.session_state.conversation_history = ConversationWindow(model=CHAT_MODEL)
             st.session_state.messages = []
+            st.session_state.pop("last_response_stats", None)
             st.rerun()
+        
+        streaming_enabled = st.toggle(
+            "⚡ Réponses en streaming",
+            value=True,
+            help="Affiche la réponse au fur et à mesure de sa génération"
+        )
+        
+        # Paramètres de la fenêtre d'historique envoyée à l'API
+        with st.expander("🧠 Mémoire"):
+            token_budget = st.number_input(
+                "Budget de tokens de l'historique",
+                min_value=500,
+                max_value=12000,
+                value=3000,
+                step=500,
+                help="Au-delà, les plus anciens échanges sont retirés du contexte"
+            )
+            summarize_history = st.checkbox(
+                "Résumer les anciens échanges",
+                value=True,
+                help="Condense les échanges retirés dans un résumé glissant"
+            )
+        
+        st.session_state.conversation_history.token_budget = token_budget
+        st.session_state.conversation_history.summarize = summarize_history
 
     # Affichage de l'historique des messages
     chat_container = st.container()
@@ -149,16 +232,37 @@ if client:
             st.markdown(user_input)
         
         # Génération et affichage de la réponse
+        # Historique limité au budget de tokens (en réservant la place du nouveau message)
+        context_messages = st.session_state.conversation_history.context(
+            client,
+            reserved_tokens=count_message_tokens({"role": "user", "content": user_input}, CHAT_MODEL)
+        )
+        
+        response_stats = {}
         with st.chat_message("assistant"):
-            with st.spinner("🤔 Réflexion en cours..."):
-                response = get_chatbot_response(client, user_input, st.session_state.conversation_history)
-            
-            st.markdown(response)
+            if streaming_enabled:
+                try:
+                    response = st.write_stream(
+                        stream_chatbot_response(client, user_input, context_messages, response_stats)
+                    )
+                except Exception as e:
+                    st.error(f"❌ Erreur lors de la génération de la réponse: {str(e)}")
+                    response = None
+            else:
+                with st.spinner("🤔 Réflexion en cours..."):
+                    response = get_chatbot_response(client, user_input, context_messages, response_stats)
+                
+                if response is not None:
+                    st.markdown(response)
         
-        # Ajout des messages à l'historique
-        st.session_state.conversation_history.append({"role": "user", "content": user_input})
-        st.session_state.conversation_history.append({"role": "assistant", "content": response})
-        st.session_state.messages.append({"role": "assistant", "content": response})
+        if response_stats:
+            st.session_state.last_response_stats = response_stats
+        
+        # Ajout des messages à l'historique (une réponse en erreur ou interrompue n'est pas conservée)
+        if response is not None:
+            st.session_state.conversation_history.append({"role": "user", "content": user_input})
+            st.session_state.conversation_history.append({"role": "assistant", "content": response})
+            st.session_state.messages.append({"role": "assistant", "content": response})
 
 else:
     # Message d'information si pas de clé API
@@ -182,7 +286,8 @@ with st.sidebar:
     
     **Fonctionnalités:**
     - 💬 Conversation en temps réel
-    - 🧠 Mémoire de conversation
+    - ⚡ Réponses en streaming
+    - 🧠 Mémoire de conversation (budget de tokens)
     - 🔑 Saisie sécurisée de clé API
     - 🗑️ Effacement de l'historique
     
@@ -200,6 +305,22 @@ with st.sidebar:
         
         st.metric("Messages utilisateur", user_messages)
         st.metric("Réponses assistant", assistant_messages)
+        
+        # Taille du contexte envoyé à l'API
+        history = st.session_state.conversation_history
+        st.metric("Tokens de contexte", f"{history.window_tokens} / {history.token_budget}")
+        if history.start_index:
+            st.caption(f"{history.start_index} message(s) hors contexte, dont {history.summarized_messages} résumé(s)")
+        
+        # Performances de la dernière réponse
+        if "last_response_stats" in st.session_state:
+            last_stats = st.session_state.last_response_stats
+            st.metric("Temps avant le 1er token", f"{last_stats['ttft'] * 1000:.0f} ms")
+            st.metric("Débit", f"{last_stats['tokens_per_second']:.1f} tokens/s")
+            st.caption(
+                f"{last_stats['tokens']} tokens en {last_stats['total_time']:.2f} s "
+                f"({'streaming' if last_stats['streaming'] else 'sans streaming'})"
+            )
     
     # Statut de la connexion API
     st.markdown("### 🔌 Statut de l'API")
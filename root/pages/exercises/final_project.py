@@ -1,8 +1,22 @@
 import streamlit as st
-import openai
-import requests
+from openai_client import initialize_openai_client
+from response_cache import cached_chat_completion, get_response_cache, show_cache_stats
+from story_pipeline import (
+    PIPELINE_STAGES,
+    STORY_MODEL,
+    VISION_MODEL,
+    build_description_messages,
+    build_story_messages,
+    clean_prompt_for_dalle,
+    run_storyboard
+)
+from image_fetch import fetch_image_bytes
+from vision_encoding import encode_for_vision
+from perceptual_cache import get_perceptual_cache
+from artifact_store import get_artifact_store, show_artifact_usage
+from image_batch import BATCH_STYLES, DEFAULT_IMAGES_PER_MINUTE, expand_batch_prompts, generate_image_batch
 from io import BytesIO
-import base64
+import time
 from PIL import Image
 
 # Configuration de la page
@@ -15,60 +29,28 @@ st.set_page_config(
 st.title("🎨 Générateur d'Histoires Visuelles")
 st.markdown("---")
 
+# Nombre maximum de scènes générées en une fois dans le storyboard
+MAX_STORYBOARD_SCENES = 12
+
 # Fonctions utilitaires
-def initialize_openai_client(api_key):
-    """Initialise le client OpenAI avec la clé API fournie par l'utilisateur"""
-    try:
-        if not api_key:
-            return None
-        
-        if not api_key.startswith('sk-'):
-            st.error("❌ Format de clé API invalide. La clé doit commencer par 'sk-'")
-            return None
-        
-        # Initialisation du client OpenAI
-        client = openai.OpenAI(api_key=api_key)
-        
-        # Test de validation de la clé API
-        try:
-            test_response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "test"}],
-                max_tokens=1
-            )
-            return client
-        except Exception as e:
-            st.error(f"❌ Clé API invalide ou problème de connexion: {str(e)}")
-            return None
-            
-    except Exception as e:
-        st.error(f"❌ Erreur lors de l'initialisation du client OpenAI: {str(e)}")
-        return None
+def improve_story_prompt(client, user_prompt, creativity_level=0.8, use_cache=None):
+    """
+    Améliore et complète un prompt d'histoire avec ChatGPT
 
-def improve_story_prompt(client, user_prompt, creativity_level=0.8):
-    """Améliore et complète un prompt d'histoire avec ChatGPT"""
+    Une réponse échantillonnée (créativité non nulle) n'est pas relue dans le cache,
+    sauf si use_cache=True est demandé explicitement.
+    """
+    if use_cache is None:
+        use_cache = creativity_level == 0
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": """Tu es un expert en création d'histoires et en génération d'images. 
-                 Ta mission est d'améliorer et de compléter un prompt d'histoire fourni par l'utilisateur.
-                 Tu dois:
-                 1. Enrichir l'histoire avec des détails visuels
-                 2. Ajouter des éléments narratifs captivants
-                 3. Créer une description qui sera parfaite pour générer une image
-                 4. Garder l'essence de l'idée originale
-                 5. Répondre en français
-                 6. IMPORTANT: Éviter tout contenu violent, politique, sexuel ou inapproprié
-                 7. Privilégier des thèmes positifs, créatifs et familiaux
-                 
-                 Ton amélioration doit être créative, détaillée, visuellement riche et adaptée à DALL-E."""},
-                {"role": "user", "content": f"Améliore et complète cette idée d'histoire en évitant tout contenu inapproprié: {user_prompt}"}
-            ],
+        return cached_chat_completion(
+            client,
+            model=STORY_MODEL,
+            messages=build_story_messages(user_prompt),
+            use_cache=use_cache,
             max_tokens=500,
             temperature=creativity_level
         )
-        return response.choices[0].message.content
     except Exception as e:
         st.error(f"❌ Erreur lors de l'amélioration du prompt: {str(e)}")
         return None
@@ -90,9 +72,8 @@ def generate_image_with_dalle(client, prompt, size="1024x1024", quality="standar
         # Récupérer l'URL de l'image
         image_url = response.data[0].url
         
-        # Télécharger l'image
-        image_response = requests.get(image_url)
-        image_data = BytesIO(image_response.content)
+        # Télécharger l'image (session partagée, délais et nouvelles tentatives)
+        image_data = fetch_image_bytes(image_url)
         
         return image_data, image_url
         
@@ -106,84 +87,59 @@ def generate_image_with_dalle(client, prompt, size="1024x1024", quality="standar
             st.error(f"❌ Erreur lors de la génération d'image: {str(e)}")
         return None, None
 
-def clean_prompt_for_dalle(prompt):
-    """Nettoie et optimise le prompt pour DALL-E"""
-    # Supprimer les mots ou phrases potentiellement problématiques
-    problematic_words = [
-        "violent", "violence", "sang", "mort", "tuer", "guerre", "arme",
-        "politique", "religion", "sexuel", "nu", "nudité", "drogue",
-        "alcool", "cigarette", "tabac", "haine", "discrimination"
-    ]
-    
-    cleaned_prompt = prompt.lower()
-    
-    # Remplacer les mots problématiques par des alternatives
-    replacements = {
-        "violent": "énergique",
-        "violence": "action",
-        "sang": "rouge",
-        "mort": "endormi",
-        "tuer": "vaincre",
-        "guerre": "conflit",
-        "arme": "outil",
-        "politique": "gouvernement",
-        "religion": "spiritualité",
-        "drogue": "potion",
-        "alcool": "boisson",
-        "cigarette": "bâton",
-        "tabac": "herbe"
-    }
-    
-    for word, replacement in replacements.items():
-        cleaned_prompt = cleaned_prompt.replace(word, replacement)
-    
-    # Limiter la longueur du prompt (DALL-E a une limite)
-    if len(cleaned_prompt) > 1000:
-        cleaned_prompt = cleaned_prompt[:1000] + "..."
-    
-    # Ajouter des termes positifs pour améliorer la génération
-    positive_terms = "artistic, beautiful, detailed, high quality, masterpiece"
-    cleaned_prompt = f"{cleaned_prompt}, {positive_terms}"
-    
-    return cleaned_prompt
-
 def describe_image(client, image_data):
     """Génère une description de l'image avec GPT-4 Vision"""
     try:
-        # Convertir l'image en base64
         image_data.seek(0)
-        image_base64 = base64.b64encode(image_data.read()).decode()
-        
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Modèle mis à jour pour Vision
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Décris cette image en détail. Raconte ce que tu vois, l'atmosphère, les couleurs, les personnages, l'action qui se déroule. Sois créatif et narratif dans ta description."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{image_base64}",
-                                "detail": "high"
-                            }
-                        }
-                    ]
-                }
-            ],
+        image = Image.open(image_data)
+        
+        # Une image déjà décrite (même après un rerun ou une recompression) n'est pas renvoyée à l'API
+        perceptual_cache = get_perceptual_cache()
+        image_hash = perceptual_cache.image_hash(image)
+        description = perceptual_cache.get(image_hash, "description")
+        if description is not None:
+            return description
+        
+        # Réduire l'image à la résolution effective de Vision et l'encoder en JPEG
+        description = cached_chat_completion(
+            client,
+            model=VISION_MODEL,
+            messages=build_description_messages(encode_for_vision(image)),
             max_tokens=500
         )
         
-        return response.choices[0].message.content
+        perceptual_cache.set(image_hash, "description", description)
+        return description
         
     except Exception as e:
         st.error(f"❌ Erreur lors de la description d'image: {str(e)}")
         st.error(f"Détails de l'erreur: {type(e).__name__}")
         return None
 
+def load_generated_image():
+    """Retourne l'image de l'histoire (BytesIO) depuis le store de la session, ou None si elle a expiré"""
+    image_id = st.session_state.get("generated_image_id")
+    data = get_artifact_store().get(image_id) if image_id else None
+    return BytesIO(data) if data is not None else None
+
+def render_storyboard_scene(result):
+    """Affiche une scène du storyboard (image, histoire et description)"""
+    st.markdown(f"**Scène {result['index'] + 1}** · {result['idea']}")
+    
+    if result["error"]:
+        st.error(f"❌ {result['error']}")
+        return
+    
+    # Pendant la génération l'image est en mémoire, ensuite elle est relue depuis le store
+    image_data = result["image_bytes"] or get_artifact_store().get(result.get("image_id"))
+    if image_data is not None:
+        st.image(image_data, use_container_width=True)
+    with st.expander("📖 Histoire"):
+        st.markdown(result["story"])
+    if result["description"]:
+        with st.expander("🔍 Description"):
+            st.markdown(result["description"])
+
 # Section de saisie de la clé API
 st.subheader("🔑 Configuration de l'API OpenAI")
 
@@ -223,7 +179,7 @@ if client:
     st.markdown("---")
     
     # Onglets pour organiser le workflow
-    tab1, tab2, tab3, tab4 = st.tabs(["📝 Création d'Histoire", "🎨 Génération d'Image", "🖼️ Galerie", "ℹ️ À propos"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["📝 Création d'Histoire", "🎨 Génération d'Image", "🖼️ Galerie", "🎬 Storyboard", "ℹ️ À propos"])
     
     with tab1:
         st.header("📝 Création et Amélioration d'Histoire")
@@ -247,11 +203,15 @@ if client:
                 step=0.1,
                 help="Plus élevé = plus créatif mais moins prévisible"
             )
+            reuse_cached = st.checkbox(
+                "♻️ Réutiliser la dernière version obtenue",
+                help="Sert depuis le cache la version déjà générée pour ce texte au lieu d'en demander une nouvelle à GPT-4"
+            )
         
         if st.button("🚀 Améliorer mon histoire", type="primary", disabled=not user_prompt):
             if user_prompt:
                 with st.spinner("🔄 Amélioration de votre histoire en cours..."):
-                    improved_prompt = improve_story_prompt(client, user_prompt, creativity_level)
+                    improved_prompt = improve_story_prompt(client, user_prompt, creativity_level, use_cache=reuse_cached or None)
                 
                 if improved_prompt:
                     st.success("✅ Histoire améliorée avec succès !")
@@ -314,6 +274,8 @@ if client:
             if "custom_prompt" not in locals():
                 custom_prompt = st.session_state.improved_story
             
+            generated_image = load_generated_image()
+            
             # Bouton de génération
             if st.button("🎨 Générer l'image", type="primary"):
                 with st.spinner("🎨 Génération de l'image en cours... (cela peut prendre 30-60 secondes)"):
@@ -331,8 +293,8 @@ if client:
                     image = Image.open(image_data)
                     st.image(image, caption="Votre histoire visualisée", use_column_width=True)
                     
-                    # Stocker dans la session
-                    st.session_state.generated_image = image_data
+                    # Stocker dans la session (sur disque, hors mémoire)
+                    st.session_state.generated_image_id = get_artifact_store().put(image_data.getvalue())
                     st.session_state.image_url = image_url
                     st.session_state.image_prompt = custom_prompt
                     
@@ -373,12 +335,12 @@ if client:
                         st.markdown(st.session_state.image_description)
             
             # Si une image existe déjà dans la session, l'afficher
-            elif "generated_image" in st.session_state:
+            elif generated_image is not None:
                 st.markdown("### 🎨 Image générée précédemment")
                 st.info("Une image a déjà été générée pour cette histoire.")
                 
                 # Afficher l'image existante
-                image = Image.open(st.session_state.generated_image)
+                image = Image.open(generated_image)
                 st.image(image, caption="Votre histoire visualisée", use_column_width=True)
                 
                 # Boutons d'action pour l'image existante
@@ -386,10 +348,10 @@ if client:
                 
                 with col1:
                     # Téléchargement
-                    st.session_state.generated_image.seek(0)
+                    generated_image.seek(0)
                     st.download_button(
                         label="📥 Télécharger l'image",
-                        data=st.session_state.generated_image.getvalue(),
+                        data=generated_image.getvalue(),
                         file_name="histoire_visualisee.png",
                         mime="image/png"
                     )
@@ -399,8 +361,8 @@ if client:
                     if st.button("🔍 Décrire l'image", key="describe_existing"):
                         # Copier image_data pour éviter les problèmes de position
                         image_data_copy = BytesIO()
-                        st.session_state.generated_image.seek(0)
-                        image_data_copy.write(st.session_state.generated_image.read())
+                        generated_image.seek(0)
+                        image_data_copy.write(generated_image.read())
                         image_data_copy.seek(0)
                         
                         with st.spinner("🔄 Génération de la description..."):
@@ -416,8 +378,8 @@ if client:
                     # Générer une nouvelle image
                     if st.button("🔄 Générer une nouvelle image"):
                         # Supprimer l'ancienne image de la session
-                        if "generated_image" in st.session_state:
-                            del st.session_state["generated_image"]
+                        if "generated_image_id" in st.session_state:
+                            del st.session_state["generated_image_id"]
                         if "image_url" in st.session_state:
                             del st.session_state["image_url"]
                         if "image_description" in st.session_state:
@@ -428,6 +390,68 @@ if client:
                 if "image_description" in st.session_state:
                     st.markdown("### 📝 Description de l'image")
                     st.markdown(st.session_state.image_description)
+            
+            # Plusieurs candidats générés en parallèle pour la même histoire
+            with st.expander("🗂️ Générer plusieurs candidats"):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    candidate_count = st.number_input("Candidats par style", min_value=1, max_value=10, value=4)
+                with col2:
+                    candidate_styles = st.multiselect("Styles", list(BATCH_STYLES), key="candidate_styles")
+                with col3:
+                    candidate_rate = st.number_input(
+                        "Images par minute maximum",
+                        min_value=1,
+                        max_value=500,
+                        value=DEFAULT_IMAGES_PER_MINUTE,
+                        key="candidate_rate"
+                    )
+                
+                if st.button("🚀 Générer les candidats"):
+                    candidate_jobs = expand_batch_prompts(
+                        [clean_prompt_for_dalle(custom_prompt)],
+                        candidate_styles,
+                        int(candidate_count)
+                    )
+                    progress_bar = st.progress(0.0, text="Génération des candidats...")
+                    grid_columns = st.columns(4)
+                    placeholders = [grid_columns[index % 4].empty() for index in range(len(candidate_jobs))]
+                    
+                    candidates = [None] * len(candidate_jobs)
+                    for done, (index, image_bytes, error) in enumerate(
+                        generate_image_batch(
+                            client,
+                            candidate_jobs,
+                            size=image_size,
+                            quality=image_quality,
+                            images_per_minute=candidate_rate
+                        ),
+                        start=1
+                    ):
+                        if error is None:
+                            candidates[index] = get_artifact_store().put(image_bytes)
+                            placeholders[index].image(image_bytes, caption=f"Candidat {index + 1}", use_container_width=True)
+                        else:
+                            placeholders[index].error(f"❌ Candidat {index + 1}: {str(error)}")
+                        progress_bar.progress(done / len(candidate_jobs), text=f"{done}/{len(candidate_jobs)} candidat(s)")
+                    
+                    st.session_state.image_candidates = candidates
+                
+                elif "image_candidates" in st.session_state:
+                    grid_columns = st.columns(4)
+                    for index, image_id in enumerate(st.session_state.image_candidates):
+                        thumbnail = get_artifact_store().thumbnail(image_id) if image_id else None
+                        if thumbnail is None:
+                            continue
+                        with grid_columns[index % 4]:
+                            st.image(thumbnail, caption=f"Candidat {index + 1}", use_container_width=True)
+                            if st.button("✅ Choisir", key=f"choose_candidate_{index}"):
+                                # Le candidat choisi devient l'image de l'histoire
+                                st.session_state.generated_image_id = image_id
+                                st.session_state.image_prompt = custom_prompt
+                                st.session_state.pop("image_url", None)
+                                st.session_state.pop("image_description", None)
+                                st.rerun()
         else:
             st.info("👈 Veuillez d'abord créer une histoire dans l'onglet 'Création d'Histoire'")
     
@@ -435,7 +459,8 @@ if client:
         st.header("🖼️ Galerie de vos Créations")
         st.markdown("Visualisez vos histoires et images créées")
         
-        if "generated_image" in st.session_state:
+        generated_image = load_generated_image()
+        if generated_image is not None:
             # Afficher la création complète
             st.markdown("### 🎭 Votre Création Complète")
             
@@ -451,7 +476,7 @@ if client:
             
             # Image générée
             st.markdown("**🎨 Image générée:**")
-            image = Image.open(st.session_state.generated_image)
+            image = Image.open(generated_image)
             st.image(image, caption="Votre histoire visualisée", use_column_width=True)
             
             # Prompt utilisé pour l'image
@@ -470,10 +495,10 @@ if client:
             
             with col1:
                 # Téléchargement de l'image
-                st.session_state.generated_image.seek(0)
+                generated_image.seek(0)
                 st.download_button(
                     label="📥 Télécharger l'image",
-                    data=st.session_state.generated_image.getvalue(),
+                    data=generated_image.getvalue(),
                     file_name="ma_creation.png",
                     mime="image/png"
                 )
@@ -509,7 +534,7 @@ URL DE L'IMAGE:
                 # Nouvelle création
                 if st.button("🔄 Nouvelle création"):
                     # Effacer la session
-                    for key in ['improved_story', 'original_story', 'generated_image', 'image_url', 'image_prompt', 'image_description']:
+                    for key in ['improved_story', 'original_story', 'generated_image_id', 'image_url', 'image_prompt', 'image_description']:
                         if key in st.session_state:
                             del st.session_state[key]
                     st.rerun()
@@ -518,6 +543,106 @@ URL DE L'IMAGE:
             st.info("🎨 Aucune création disponible. Créez votre première histoire dans l'onglet 'Création d'Histoire' !")
     
     with tab4:
+        st.header("🎬 Storyboard")
+        st.markdown("Générez plusieurs scènes en parallèle : chaque idée est améliorée, illustrée puis décrite")
+        
+        scenes_text = st.text_area(
+            "Idées de scènes (une par ligne):",
+            placeholder="Un dragon timide rencontre un enfant\nIls s'envolent au-dessus de la ville\nLe dragon présente sa famille",
+            height=150
+        )
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            variants = st.number_input(
+                "Variantes par scène",
+                min_value=1,
+                max_value=4,
+                value=1,
+                help="Plusieurs versions de chaque scène (le cache est alors ignoré)"
+            )
+        
+        with col2:
+            max_concurrency = st.slider(
+                "Scènes traitées en parallèle",
+                min_value=1,
+                max_value=6,
+                value=3
+            )
+        
+        with col3:
+            storyboard_size = st.selectbox(
+                "Taille des images",
+                ["1024x1024", "1792x1024", "1024x1792"],
+                key="storyboard_size"
+            )
+            describe_scenes = st.checkbox("Décrire les images", value=True)
+        
+        ideas = [line.strip() for line in scenes_text.splitlines() if line.strip()]
+        ideas = [idea for idea in ideas for _ in range(variants)]
+        
+        if len(ideas) > MAX_STORYBOARD_SCENES:
+            st.warning(f"⚠️ Seules les {MAX_STORYBOARD_SCENES} premières scènes seront générées.")
+            ideas = ideas[:MAX_STORYBOARD_SCENES]
+        
+        if st.button("🎬 Générer le storyboard", type="primary", disabled=not ideas):
+            progress = st.progress(0.0, text="🔄 Génération des scènes en cours...")
+            grid = st.columns(3)
+            slots = [grid[i % 3].empty() for i in range(len(ideas))]
+            completed = []
+            
+            def show_scene_result(result):
+                """Affiche une scène dès qu'elle est terminée"""
+                completed.append(result)
+                with slots[result["index"]].container():
+                    render_storyboard_scene(result)
+                progress.progress(len(completed) / len(ideas), text=f"✅ {len(completed)}/{len(ideas)} scène(s) terminée(s)")
+            
+            start_time = time.perf_counter()
+            st.session_state.storyboard = run_storyboard(
+                api_key,
+                ideas,
+                max_concurrency=max_concurrency,
+                size=storyboard_size,
+                creativity_level=0.8,
+                describe=describe_scenes,
+                on_result=show_scene_result
+            )
+            st.session_state.storyboard_time = time.perf_counter() - start_time
+            
+            # Les images des scènes quittent la mémoire de la session pour le store
+            for result in st.session_state.storyboard:
+                if result["image_bytes"] is not None:
+                    result["image_id"] = get_artifact_store().put(result["image_bytes"])
+                    result["image_bytes"] = None
+        
+        elif "storyboard" in st.session_state:
+            grid = st.columns(3)
+            for result in st.session_state.storyboard:
+                with grid[result["index"] % 3]:
+                    render_storyboard_scene(result)
+        
+        # Latence par étape
+        if "storyboard" in st.session_state:
+            st.markdown("### ⏱️ Latence par étape")
+            st.dataframe(
+                [
+                    {
+                        "Scène": result["index"] + 1,
+                        **{stage: f"{result['timings'][stage]:.1f} s" for stage in PIPELINE_STAGES + ["total"] if stage in result["timings"]}
+                    }
+                    for result in st.session_state.storyboard
+                ],
+                use_container_width=True
+            )
+            sequential_time = sum(result["timings"]["total"] for result in st.session_state.storyboard)
+            st.caption(
+                f"Durée totale : {st.session_state.storyboard_time:.1f} s "
+                f"(contre {sequential_time:.1f} s en séquentiel)"
+            )
+    
+    with tab5:
         st.header("ℹ️ À propos du Projet")
         st.markdown("""
         ### 🎭 Générateur d'Histoires Visuelles
@@ -645,12 +770,17 @@ with st.sidebar:
     else:
         st.error("Non connecté ❌")
     
+    # Statistiques du cache de réponses
+    show_cache_stats(get_response_cache(), "Cache de réponses")
+    show_cache_stats(get_perceptual_cache(), "Cache perceptuel")
+    show_artifact_usage(get_artifact_store())
+    
     # Informations sur la session
     if "improved_story" in st.session_state:
         st.markdown("### 📊 Session actuelle")
         st.success("✅ Histoire créée")
         
-        if "generated_image" in st.session_state:
+        if "generated_image_id" in st.session_state:
             st.success("✅ Image générée")
         
         if "image_description" in st.session_state:
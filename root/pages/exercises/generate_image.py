@@ -1,8 +1,18 @@
 import streamlit as st
-import requests
-from io import BytesIO
 from PIL import Image
-from openai import OpenAI
+from openai_client import initialize_openai_client
+from response_cache import cached_chat_completion, get_response_cache, show_cache_stats
+from image_fetch import image_bytes_from_result
+from artifact_store import get_artifact_store, show_artifact_usage
+from image_preprocess import open_image, prepare_edit_image, prepare_edit_mask
+from image_batch import (
+    BATCH_STYLES,
+    DEFAULT_IMAGES_PER_MINUTE,
+    MAX_BATCH_IMAGES,
+    expand_batch_prompts,
+    generate_image_batch,
+    write_batch_zip
+)
 
 # Configuration de la page
 st.set_page_config(
@@ -15,56 +25,21 @@ st.set_page_config(
 st.title("🎨 Générateur d'Images DALL-E Avancé")
 st.markdown("---")
 
-# Configuration de l'API OpenAI avec saisie utilisateur
-def initialize_openai_client(api_key):
-    """Initialise le client OpenAI avec la clé API fournie par l'utilisateur"""
-    try:
-        if not api_key:
-            return None
-        
-        if not api_key.startswith('sk-'):
-            st.error("❌ Format de clé API invalide. La clé doit commencer par 'sk-'")
-            return None
-        
-        # Initialisation du client OpenAI
-        client = OpenAI(api_key=api_key)
-        
-        # Test de validation de la clé API
-        try:
-            # Test simple pour vérifier si la clé fonctionne
-            test_response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "test"}],
-                max_tokens=1
-            )
-            return client
-        except Exception as e:
-            st.error(f"❌ Clé API invalide ou problème de connexion: {str(e)}")
-            return None
-            
-    except Exception as e:
-        st.error(f"❌ Erreur lors de l'initialisation du client OpenAI: {str(e)}")
-        return None
-
 def openai_create_image(client, prompt: str):
     """Génère une image avec DALL-E à partir d'un prompt textuel"""
     try:
         # Appel à l'API DALL-E avec la nouvelle syntaxe
+        # L'image est renvoyée en base64 dans la réponse : pas de second appel HTTP
         response = client.images.generate(
             model="dall-e-3",
             prompt=prompt,
             n=1,
-            size="1024x1024"
+            size="1024x1024",
+            response_format="b64_json"
         )
         
-        # Récupération de l'URL de l'image générée
-        image_url = response.data[0].url
-        
-        # Téléchargement de l'image depuis l'URL
-        image_response = requests.get(image_url)
-        
         # Conversion de l'image en format PIL
-        image = Image.open(BytesIO(image_response.content))
+        image = Image.open(image_bytes_from_result(response.data[0]))
         
         return image
         
@@ -72,7 +47,7 @@ def openai_create_image(client, prompt: str):
         st.error(f"Erreur lors de la génération de l'image: {str(e)}")
         return None
 
-def openai_create_image_variation(client, image_file, prompt: str = ""):
+def openai_create_image_variation(client, image_file, prompt: str = "", region=None):
     """Crée une variante d'une image existante en fonction d'un prompt"""
     try:
         # Si pas de prompt, utiliser l'API de variation classique
@@ -80,7 +55,7 @@ def openai_create_image_variation(client, image_file, prompt: str = ""):
             return create_simple_variation(client, image_file)
         
         # Avec prompt: utiliser l'API d'édition d'images
-        return create_variation_with_prompt(client, image_file, prompt)
+        return create_variation_with_prompt(client, image_file, prompt, region)
         
     except Exception as e:
         st.error(f"Erreur lors de la création de la variante: {str(e)}")
@@ -89,70 +64,20 @@ def openai_create_image_variation(client, image_file, prompt: str = ""):
 def create_simple_variation(client, image_file):
     """Crée une variation simple sans prompt"""
     try:
-        # Conversion de l'image en format requis pour l'API
-        if hasattr(image_file, 'read'):
-            # Si c'est un fichier uploadé par Streamlit
-            image_file.seek(0)  # Réinitialiser le pointeur du fichier
-            image = Image.open(image_file)
-        else:
-            # Si c'est déjà une image PIL
-            image = image_file
-        
-        # Conversion en RGBA si nécessaire, puis en RGB
-        if image.mode in ('RGBA', 'LA'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'RGBA':
-                background.paste(image, mask=image.split()[-1])
-            else:
-                background.paste(image)
-            image = background
-        elif image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Redimensionner l'image si nécessaire
-        valid_sizes = [(256, 256), (512, 512), (1024, 1024)]
-        current_size = image.size
-        
-        if current_size not in valid_sizes:
-            if max(current_size) <= 256:
-                target_size = (256, 256)
-            elif max(current_size) <= 512:
-                target_size = (512, 512)
-            else:
-                target_size = (1024, 1024)
-            
-            image.thumbnail(target_size, Image.Resampling.LANCZOS)
-            new_image = Image.new('RGB', target_size, (255, 255, 255))
-            paste_x = (target_size[0] - image.size[0]) // 2
-            paste_y = (target_size[1] - image.size[1]) // 2
-            new_image.paste(image, (paste_x, paste_y))
-            image = new_image
-        
-        # Convertir en bytes PNG avec type MIME correct
-        img_buffer = BytesIO()
-        image.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        
-        # Vérifier la taille du fichier
-        if len(img_buffer.getvalue()) > 4 * 1024 * 1024:
-            st.error("❌ L'image est trop volumineuse. Elle doit faire moins de 4MB.")
-            return None
-        
-        # Créer un fichier avec le bon type MIME pour l'API
-        image_file_for_api = BytesIO(img_buffer.getvalue())
-        image_file_for_api.name = 'image.png'  # Spécifier le nom avec extension PNG
+        # Conversion, redimensionnement et encodage PNG en une seule passe
+        # (compression ou réduction automatique pour rester sous 4MB)
+        image_file_for_api, side = prepare_edit_image(image_file)
         
         # Appel à l'API de variation
         response = client.images.create_variation(
             image=image_file_for_api,
             n=1,
-            size=f"{image.size[0]}x{image.size[1]}"
+            size=f"{side}x{side}",
+            response_format="b64_json"
         )
         
-        # Récupération de l'URL de la variante
-        variation_url = response.data[0].url
-        variation_response = requests.get(variation_url)
-        variation_image = Image.open(BytesIO(variation_response.content))
+        # Récupération de la variante
+        variation_image = Image.open(image_bytes_from_result(response.data[0]))
         
         return variation_image
         
@@ -160,69 +85,15 @@ def create_simple_variation(client, image_file):
         st.error(f"Erreur lors de la création de la variation simple: {str(e)}")
         return None
 
-def create_variation_with_prompt(client, image_file, prompt: str):
-    """Crée une variation avec prompt en utilisant l'API d'édition"""
+def create_variation_with_prompt(client, image_file, prompt: str, region=None):
+    """Crée une variation avec prompt en utilisant l'API d'édition (sur toute l'image ou sur une zone)"""
     try:
-        # Conversion de l'image en format requis
-        if hasattr(image_file, 'read'):
-            image_file.seek(0)
-            image = Image.open(image_file)
-        else:
-            image = image_file
-        
-        # Conversion en RGBA si nécessaire, puis en RGB
-        if image.mode in ('RGBA', 'LA'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'RGBA':
-                background.paste(image, mask=image.split()[-1])
-            else:
-                background.paste(image)
-            image = background
-        elif image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Redimensionner si nécessaire
-        valid_sizes = [(256, 256), (512, 512), (1024, 1024)]
-        current_size = image.size
-        
-        if current_size not in valid_sizes:
-            if max(current_size) <= 256:
-                target_size = (256, 256)
-            elif max(current_size) <= 512:
-                target_size = (512, 512)
-            else:
-                target_size = (1024, 1024)
-            
-            image.thumbnail(target_size, Image.Resampling.LANCZOS)
-            new_image = Image.new('RGB', target_size, (255, 255, 255))
-            paste_x = (target_size[0] - image.size[0]) // 2
-            paste_y = (target_size[1] - image.size[1]) // 2
-            new_image.paste(image, (paste_x, paste_y))
-            image = new_image
-        
-        # Créer un masque transparent (pour édition globale)
-        mask = Image.new('RGBA', image.size, (0, 0, 0, 0))
-        
-        # Convertir en bytes avec type MIME correct
-        img_buffer = BytesIO()
-        image.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        
-        mask_buffer = BytesIO()
-        mask.save(mask_buffer, format='PNG')
-        mask_buffer.seek(0)
-        
-        # Vérifier la taille
-        if len(img_buffer.getvalue()) > 4 * 1024 * 1024:
-            st.error("❌ L'image est trop volumineuse.")
-            return None
+        # Conversion, redimensionnement et encodage PNG en une seule passe
+        source_size = open_image(image_file).size
+        image_file_for_api, side = prepare_edit_image(image_file)
         
-        # Créer un fichier avec le bon type MIME
-        image_file_for_api = BytesIO(img_buffer.getvalue())
-        image_file_for_api.name = 'image.png'  # Spécifier le nom avec extension
-        
-        mask_file_for_api = BytesIO(mask_buffer.getvalue())
-        mask_file_for_api.name = 'mask.png'  # Spécifier le nom avec extension
+        # Masque précalculé (édition globale) ou compilé une fois pour la zone choisie
+        mask_file_for_api = prepare_edit_mask(side, region, source_size)
         
         # Utiliser l'API d'édition avec un prompt
         response = client.images.edit(
@@ -230,13 +101,12 @@ def create_variation_with_prompt(client, image_file, prompt: str):
             mask=mask_file_for_api,
             prompt=f"Transform this image: {prompt}",
             n=1,
-            size=f"{image.size[0]}x{image.size[1]}"
+            size=f"{side}x{side}",
+            response_format="b64_json"
         )
         
-        # Récupération de l'URLs
-        edited_url = response.data[0].url
-        edited_response = requests.get(edited_url)
-        edited_image = Image.open(BytesIO(edited_response.content))
+        # Récupération de l'image éditée
+        edited_image = Image.open(image_bytes_from_result(response.data[0]))
         
         return edited_image
         
@@ -253,12 +123,11 @@ def create_variation_with_prompt(client, image_file, prompt: str):
                 model="dall-e-3",
                 prompt=enhanced_prompt,
                 n=1,
-                size="1024x1024"
+                size="1024x1024",
+                response_format="b64_json"
             )
             
-            image_url = response.data[0].url
-            image_response = requests.get(image_url)
-            generated_image = Image.open(BytesIO(image_response.content))
+            generated_image = Image.open(image_bytes_from_result(response.data[0]))
             
             return generated_image
             
@@ -266,8 +135,15 @@ def create_variation_with_prompt(client, image_file, prompt: str):
             st.error(f"❌ Erreur lors de la génération alternative: {str(e2)}")
             return None
 
-def generate_prompt_with_chatgpt(client, user_text: str):
-    """Génère un prompt amélioré pour DALL-E en utilisant ChatGPT"""
+def generate_prompt_with_chatgpt(client, user_text: str, use_cache: bool = None, temperature: float = 0.7):
+    """
+    Génère un prompt amélioré pour DALL-E en utilisant ChatGPT
+
+    Une réponse échantillonnée (température non nulle) n'est pas relue dans le cache,
+    sauf si use_cache=True est demandé explicitement.
+    """
+    if use_cache is None:
+        use_cache = temperature == 0
     try:
         # Prompt système pour optimiser la génération
         system_prompt = """Tu es un expert en génération de prompts pour DALL-E. 
@@ -282,18 +158,20 @@ def generate_prompt_with_chatgpt(client, user_text: str):
         - Réponds uniquement avec le prompt amélioré, sans explication"""
         
         # Appel à l'API ChatGPT
-        response = client.chat.completions.create(
+        content = cached_chat_completion(
+            client,
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": f"Améliore ce texte en prompt pour DALL-E: {user_text}"}
             ],
+            use_cache=use_cache,
             max_tokens=300,
-            temperature=0.7
+            temperature=temperature
         )
         
         # Récupération du prompt amélioré
-        enhanced_prompt = response.choices[0].message.content.strip()
+        enhanced_prompt = content.strip()
         
         return enhanced_prompt
         
@@ -340,7 +218,7 @@ if client:
     st.markdown("---")
     
     # Onglets pour différentes fonctionnalités
-    tab1, tab2, tab3 = st.tabs(["🎨 Génération", "🔄 Variations", "✨ Prompt Amélioré"])
+    tab1, tab2, tab3, tab4 = st.tabs(["🎨 Génération", "🔄 Variations", "✨ Prompt Amélioré", "🗂️ Génération par lot"])
 
     with tab1:
         st.header("Génération d'image classique")
@@ -355,8 +233,8 @@ if client:
                 if image:
                     st.image(image, caption=f"Image générée: {prompt}")
                     
-                    # Sauvegarder l'image dans la session pour les variations
-                    st.session_state.generated_image = image
+                    # Sauvegarder l'image dans la session pour les variations (sur disque, hors mémoire)
+                    st.session_state.generated_image_id = get_artifact_store().put_image(image)
                     st.success("Image générée avec succès ! Vous pouvez maintenant créer des variations dans l'onglet 'Variations'.")
             else:
                 st.warning("Veuillez entrer une description.")
@@ -370,10 +248,14 @@ if client:
             st.subheader("Image source")
             
             # Option 1: Utiliser l'image générée précédemment
-            if 'generated_image' in st.session_state:
+            if 'generated_image_id' in st.session_state:
                 if st.button("Utiliser l'image générée précédemment"):
-                    st.session_state.variation_source = st.session_state.generated_image
-                    st.image(st.session_state.generated_image, caption="Image sélectionnée")
+                    selected_image = get_artifact_store().get(st.session_state.generated_image_id)
+                    if selected_image is not None:
+                        st.session_state.variation_source_id = st.session_state.generated_image_id
+                        st.image(selected_image, caption="Image sélectionnée")
+                    else:
+                        st.warning("⚠️ L'image générée n'est plus disponible, veuillez la régénérer ou uploader une image.")
             
             # Option 2: Uploader une nouvelle image
             uploaded_file = st.file_uploader(
@@ -385,12 +267,16 @@ if client:
             if uploaded_file:
                 image = Image.open(uploaded_file)
                 st.image(image, caption="Image uploadée")
-                st.session_state.variation_source = uploaded_file
+                # Le fichier n'est enregistré qu'une fois, pas à chaque rerun
+                upload_key = getattr(uploaded_file, "file_id", uploaded_file.name)
+                if st.session_state.get('variation_upload_key') != upload_key:
+                    st.session_state.variation_source_id = get_artifact_store().put(uploaded_file.getvalue())
+                    st.session_state.variation_upload_key = upload_key
         
         with col2:
             st.subheader("Créer une variation")
             
-            if 'variation_source' in st.session_state:
+            if 'variation_source_id' in st.session_state:
                 variation_prompt = st.text_area(
                     "Prompt pour la variation (optionnel):",
                     placeholder="Ex: make it more colorful, add a sunset background, change the style to watercolor...",
@@ -409,29 +295,55 @@ if client:
                         - Génération inspirée: Crée une nouvelle image basée sur la vôtre et le prompt
                         """
                     )
+                    
+                    # Zone modifiée par la variation avec prompt (masque réutilisé d'un prompt à l'autre)
+                    mask_mode = st.radio(
+                        "Zone à modifier (variation avec prompt):",
+                        ["Image entière", "Rectangle", "Masque dessiné (PNG)"],
+                        horizontal=True
+                    )
+                    edit_region = None
+                    if mask_mode == "Rectangle":
+                        x_range = st.slider("Horizontal (%)", 0, 100, (25, 75))
+                        y_range = st.slider("Vertical (%)", 0, 100, (25, 75))
+                        edit_region = (x_range[0] / 100, y_range[0] / 100, x_range[1] / 100, y_range[1] / 100)
+                    elif mask_mode == "Masque dessiné (PNG)":
+                        mask_upload = st.file_uploader(
+                            "Masque aux dimensions de l'image source",
+                            type=['png'],
+                            help="Zones transparentes (ou blanches si le masque n'a pas de transparence) = zones modifiées"
+                        )
+                        if mask_upload:
+                            edit_region = mask_upload.getvalue()
                 
                 if st.button("Créer une variation", key="variation"):
-                    with st.spinner("Création de la variation..."):
-                        if variation_type == "Variation libre (sans prompt)":
-                            variation = create_simple_variation(client, st.session_state.variation_source)
-                        elif variation_type == "Génération inspirée":
-                            if variation_prompt:
-                                enhanced_prompt = f"Create an image inspired by the uploaded image with these characteristics: {variation_prompt}"
-                                variation = openai_create_image(client, enhanced_prompt)
-                            else:
-                                variation = create_simple_variation(client, st.session_state.variation_source)
-                        else:  # Variation avec prompt
-                            variation = openai_create_image_variation(
-                                client,
-                                st.session_state.variation_source, 
-                                variation_prompt
-                            )
+                    variation_source = get_artifact_store().open_image(st.session_state.variation_source_id)
+                    variation = None
+                    if variation_source is None:
+                        st.warning("⚠️ L'image source a expiré, veuillez la sélectionner à nouveau.")
+                    else:
+                        with st.spinner("Création de la variation..."):
+                            if variation_type == "Variation libre (sans prompt)":
+                                variation = create_simple_variation(client, variation_source)
+                            elif variation_type == "Génération inspirée":
+                                if variation_prompt:
+                                    enhanced_prompt = f"Create an image inspired by the uploaded image with these characteristics: {variation_prompt}"
+                                    variation = openai_create_image(client, enhanced_prompt)
+                                else:
+                                    variation = create_simple_variation(client, variation_source)
+                            else:  # Variation avec prompt
+                                variation = openai_create_image_variation(
+                                    client,
+                                    variation_source, 
+                                    variation_prompt,
+                                    edit_region
+                                )
                     
                     if variation:
                         st.image(variation, caption="Variation créée")
                         
                         # Sauvegarder la variation
-                        st.session_state.generated_image = variation
+                        st.session_state.generated_image_id = get_artifact_store().put_image(variation)
                         st.success("Variation créée ! Vous pouvez créer d'autres variations à partir de cette image.")
             else:
                 st.info("Sélectionnez d'abord une image source")
@@ -449,6 +361,7 @@ if client:
             **✏️ Variation avec prompt**
             - Tente d'appliquer vos modifications à l'image
             - Utilise l'API d'édition quand possible
+            - Peut se limiter à une zone (rectangle ou masque PNG)
             - Peut avoir des résultats variables
             
             **🚀 Génération inspirée**
@@ -477,10 +390,15 @@ if client:
                 height=100
             )
             
+            reuse_cached = st.checkbox(
+                "♻️ Réutiliser le dernier prompt obtenu",
+                help="Sert depuis le cache le prompt déjà généré pour ce texte au lieu d'en demander un nouveau à ChatGPT"
+            )
+            
             if st.button("Améliorer le prompt", key="enhance"):
                 if user_text:
                     with st.spinner("Amélioration du prompt..."):
-                        enhanced_prompt = generate_prompt_with_chatgpt(client, user_text)
+                        enhanced_prompt = generate_prompt_with_chatgpt(client, user_text, use_cache=reuse_cached or None)
                     
                     st.session_state.enhanced_prompt = enhanced_prompt
                     st.success("Prompt amélioré généré !")
@@ -515,6 +433,140 @@ if client:
             else:
                 st.info("Générez d'abord un prompt amélioré dans la colonne de gauche")
 
+    with tab4:
+        st.header("Génération par lot")
+        st.markdown("Générez plusieurs candidats en parallèle : une liste de prompts, ou un prompt décliné en plusieurs styles.")
+        
+        batch_prompts_text = st.text_area(
+            "Prompts (un par ligne):",
+            placeholder="Un phare au coucher du soleil\nUne forêt enneigée au petit matin",
+            height=120
+        )
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            batch_styles = st.multiselect(
+                "Styles (optionnel):",
+                list(BATCH_STYLES),
+                help="Chaque prompt est généré une fois par style choisi"
+            )
+            batch_variants = st.number_input(
+                "Candidats par combinaison prompt × style",
+                min_value=1,
+                max_value=10,
+                value=1
+            )
+            batch_size = st.selectbox(
+                "Taille des images",
+                ["1024x1024", "1792x1024", "1024x1792"],
+                key="batch_size"
+            )
+        
+        with col2:
+            batch_quality = st.selectbox("Qualité", ["standard", "hd"], key="batch_quality")
+            batch_workers = st.slider(
+                "Générations simultanées",
+                min_value=1,
+                max_value=8,
+                value=4
+            )
+            batch_rate = st.number_input(
+                "Images par minute maximum",
+                min_value=1,
+                max_value=500,
+                value=DEFAULT_IMAGES_PER_MINUTE,
+                help="Limite de débit de votre compte OpenAI pour DALL-E 3 (dépend de votre palier)"
+            )
+        
+        batch_prompts = [line.strip() for line in batch_prompts_text.splitlines() if line.strip()]
+        batch_jobs = expand_batch_prompts(batch_prompts, batch_styles, int(batch_variants))
+        
+        if batch_prompts:
+            requested = len(batch_prompts) * max(len(batch_styles), 1) * int(batch_variants)
+            st.caption(f"🖼️ {len(batch_jobs)} image(s) à générer")
+            if requested > MAX_BATCH_IMAGES:
+                st.warning(f"⚠️ Le lot est limité à {MAX_BATCH_IMAGES} images ({requested} demandées).")
+        
+        if st.button("🚀 Générer le lot", key="generate_batch"):
+            if batch_jobs:
+                progress_bar = st.progress(0.0, text="Génération du lot...")
+                
+                # Grille de cases remplies au fur et à mesure que les images arrivent
+                grid_columns = st.columns(4)
+                placeholders = [grid_columns[index % 4].empty() for index in range(len(batch_jobs))]
+                for placeholder in placeholders:
+                    placeholder.info("⏳ En attente...")
+                
+                batch_images = [None] * len(batch_jobs)
+                errors = 0
+                for done, (index, image_data, error) in enumerate(
+                    generate_image_batch(
+                        client,
+                        batch_jobs,
+                        size=batch_size,
+                        quality=batch_quality,
+                        max_workers=batch_workers,
+                        images_per_minute=batch_rate
+                    ),
+                    start=1
+                ):
+                    job = batch_jobs[index]
+                    if error is None:
+                        # Seule la vignette reste en mémoire, l'original est écrit sur disque
+                        batch_images[index] = get_artifact_store().put(image_data)
+                        placeholders[index].image(image_data, caption=job["full_prompt"], use_container_width=True)
+                    else:
+                        errors += 1
+                        placeholders[index].error(f"❌ {job['full_prompt'][:60]}: {str(error)}")
+                    progress_bar.progress(done / len(batch_jobs), text=f"{done}/{len(batch_jobs)} image(s) terminée(s)")
+                
+                st.session_state.batch_result = {"jobs": batch_jobs, "images": batch_images}
+                if 'batch_zip_id' in st.session_state:
+                    get_artifact_store().discard(st.session_state.pop('batch_zip_id'))
+                if errors:
+                    st.warning(f"⚠️ {errors} image(s) n'ont pas pu être générées.")
+                else:
+                    st.success("Lot généré avec succès !")
+            else:
+                st.warning("Veuillez entrer au moins un prompt.")
+        
+        elif 'batch_result' in st.session_state:
+            # Réaffichage du dernier lot après une interaction
+            grid_columns = st.columns(4)
+            for index, (job, image_id) in enumerate(zip(st.session_state.batch_result["jobs"], st.session_state.batch_result["images"])):
+                thumbnail = get_artifact_store().thumbnail(image_id) if image_id else None
+                if thumbnail is not None:
+                    grid_columns[index % 4].image(thumbnail, caption=job["full_prompt"], use_container_width=True)
+        
+        if 'batch_result' in st.session_state and any(st.session_state.batch_result["images"]):
+            # L'archive n'est construite qu'à la demande, directement dans le dossier de la session
+            # (seul son identifiant est gardé en mémoire, jusqu'au prochain lot)
+            store = get_artifact_store()
+            zip_file = store.open_file(st.session_state.batch_zip_id) if 'batch_zip_id' in st.session_state else None
+            
+            if zip_file is None:
+                st.session_state.pop('batch_zip_id', None)
+                if st.button("🗜️ Préparer le ZIP", key="prepare_batch_zip"):
+                    with st.spinner("Création de l'archive..."):
+                        st.session_state.batch_zip_id = store.put_file(
+                            lambda file: write_batch_zip(
+                                file,
+                                st.session_state.batch_result["jobs"],
+                                (store.get(image_id) if image_id else None for image_id in st.session_state.batch_result["images"])
+                            )
+                        )
+                    zip_file = store.open_file(st.session_state.batch_zip_id)
+            
+            if zip_file is not None:
+                with zip_file:
+                    st.download_button(
+                        label="📥 Télécharger le lot (ZIP)",
+                        data=zip_file,
+                        file_name="lot_images.zip",
+                        mime="application/zip"
+                    )
+
 else:
     # Message d'information si pas de clé API
     st.info("🔑 Veuillez entrer une clé API OpenAI valide pour utiliser le générateur d'images.")
@@ -543,6 +595,10 @@ with st.sidebar:
     **✨ Prompt amélioré**
     - Laissez ChatGPT améliorer vos descriptions
     - Obtenez des résultats plus détaillés
+    
+    **🗂️ Génération par lot**
+    - Jusqu'à 50 candidats générés en parallèle
+    - Déclinez un prompt en plusieurs styles
     """)
     
     st.markdown("### 💡 Conseils")
@@ -559,6 +615,10 @@ with st.sidebar:
         st.success("Connecté ✅")
     else:
         st.error("Non connecté ❌")
+    
+    # Statistiques du cache de réponses
+    show_cache_stats(get_response_cache(), "Cache de réponses")
+    show_artifact_usage(get_artifact_store())
 
 # Style CSS personnalisé
 st.markdown("""
@@ -1,9 +1,20 @@
 import streamlit as st
 import requests
-from io import BytesIO
 from PIL import Image
-from openai import OpenAI
-import base64
+from openai_client import initialize_openai_client
+from response_cache import get_response_cache, show_cache_stats
+from perceptual_cache import DEFAULT_HAMMING_THRESHOLD, get_perceptual_cache
+from artifact_store import get_artifact_store, show_artifact_usage
+from vision_encoding import VISION_DETAIL_BY_ANALYSIS, estimate_image_tokens
+from vision_analysis import (
+    DEFAULT_ANALYSES_PER_MINUTE,
+    analyze_batch,
+    batch_rows_to_csv,
+    batch_rows_to_jsonl,
+    count_batch_images,
+    iter_batch_images,
+    request_analysis
+)
 
 # Configuration de la page
 st.set_page_config(
@@ -16,38 +27,17 @@ st.set_page_config(
 st.title("👁️ Analyse d'Images avec Vision AI")
 st.markdown("---")
 
-# Configuration de l'API OpenAI avec saisie utilisateur
-def initialize_openai_client(api_key):
-    """Initialise le client OpenAI avec la clé API fournie par l'utilisateur"""
-    try:
-        if not api_key:
-            return None
-        
-        if not api_key.startswith('sk-'):
-            st.error("❌ Format de clé API invalide. La clé doit commencer par 'sk-'")
-            return None
-        
-        # Initialisation du client OpenAI
-        client = OpenAI(api_key=api_key)
-        
-        # Test de validation de la clé API
-        try:
-            # Test simple pour vérifier si la clé fonctionne
-            test_response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "test"}],
-                max_tokens=1
-            )
-            return client
-        except Exception as e:
-            st.error(f"❌ Clé API invalide ou problème de connexion: {str(e)}")
-            return None
-            
-    except Exception as e:
-        st.error(f"❌ Erreur lors de l'initialisation du client OpenAI: {str(e)}")
-        return None
+ANALYSIS_LABELS = {
+    "general": "🔍 Analyse générale",
+    "objects": "🎯 Détection d'objets",
+    "text": "📝 Reconnaissance de texte",
+    "detailed": "📖 Analyse détaillée",
+    "artistic": "🎨 Analyse artistique",
+    "technical": "⚙️ Analyse technique",
+    "all": "🧩 Toutes les analyses (un seul appel)"
+}
 
-def vision_analyze_image(client, image, analysis_type="general"):
+def vision_analyze_image(client, image, analysis_type="general", detail=None, image_format="JPEG", threshold=None):
     """
     Analyse une image avec l'API Vision d'OpenAI
     
@@ -55,53 +45,40 @@ def vision_analyze_image(client, image, analysis_type="general"):
         client: Client OpenAI initialisé
         image: Image PIL à analyser
         analysis_type: Type d'analyse ("general", "objects", "text", "detailed")
+        detail: Niveau de détail ("low" ou "high"), choisi selon le type d'analyse si absent
+        image_format: Format d'envoi de l'image ("JPEG" ou "WEBP")
+        threshold: Distance de Hamming maximale pour réutiliser l'analyse d'une image quasi identique
     
     Returns:
         str: Description/analyse de l'image
     """
     try:
-        # Conversion de l'image en base64
-        img_buffer = BytesIO()
-        image.save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        image_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
-        
-        # Définir le prompt selon le type d'analyse
-        prompts = {
-            "general": "Décris cette image de manière détaillée. Que vois-tu ?",
-            "objects": "Identifie et liste tous les objets visibles dans cette image. Sois précis et méthodique.",
-            "text": "Y a-t-il du texte dans cette image ? Si oui, transcris-le et explique son contexte.",
-            "detailed": "Fais une analyse complète et détaillée de cette image : objets, personnes, couleurs, composition, style, ambiance, texte éventuel, et tout autre élément notable.",
-            "artistic": "Analyse cette image d'un point de vue artistique : composition, couleurs, style, technique, émotion transmise.",
-            "technical": "Analyse les aspects techniques de cette image : qualité, éclairage, perspective, mise au point, etc."
-        }
-        
-        prompt = prompts.get(analysis_type, prompts["general"])
-        
-        # Appel à l'API Vision avec le nouveau modèle
-        response = client.chat.completions.create(
-            model="gpt-4o",  # Nouveau modèle Vision d'OpenAI
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": prompt
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=500
+        # L'image est réduite à la résolution effective du niveau de détail et encodée avec perte
+        # (images déjà analysées, même légèrement modifiées, servies depuis le cache perceptuel)
+        return request_analysis(
+            client, image, analysis_type, detail, image_format,
+            perceptual_cache=get_perceptual_cache(), threshold=threshold
         )
         
-        return response.choices[0].message.content
+    except Exception as e:
+        st.error(f"❌ Erreur lors de l'analyse de l'image: {str(e)}")
+        return None
+
+def vision_analyze_all(client, image, detail="high", image_format="JPEG", threshold=None):
+    """
+    Réalise les six types d'analyse en un seul appel Vision
+    
+    L'image n'est encodée et envoyée qu'une fois ; le modèle renvoie un objet JSON
+    contenant une section par type d'analyse.
+    
+    Returns:
+        dict: Analyse par type, ou None en cas d'erreur
+    """
+    try:
+        return request_analysis(
+            client, image, "all", detail, image_format,
+            perceptual_cache=get_perceptual_cache(), threshold=threshold
+        )
         
     except Exception as e:
         st.error(f"❌ Erreur lors de l'analyse de l'image: {str(e)}")
@@ -166,7 +143,7 @@ if client:
     st.markdown("---")
     
     # Onglets pour différentes fonctionnalités
-    tab1, tab2, tab3 = st.tabs(["🖼️ Analyser une Image", "📊 Analyse Comparative", "ℹ️ Informations"])
+    tab1, tab2, tab3, tab4 = st.tabs(["🖼️ Analyser une Image", "📊 Analyse Comparative", "🗂️ Analyse par lot", "ℹ️ Informations"])
 
     with tab1:
         st.header("Analyse d'Image avec Vision AI")
@@ -200,35 +177,60 @@ if client:
                 # Type d'analyse
                 analysis_type = st.selectbox(
                     "Type d'analyse:",
-                    ["general", "objects", "text", "detailed", "artistic", "technical"],
-                    format_func=lambda x: {
-                        "general": "🔍 Analyse générale",
-                        "objects": "🎯 Détection d'objets",
-                        "text": "📝 Reconnaissance de texte",
-                        "detailed": "📖 Analyse détaillée",
-                        "artistic": "🎨 Analyse artistique",
-                        "technical": "⚙️ Analyse technique"
-                    }[x]
+                    list(ANALYSIS_LABELS),
+                    format_func=lambda x: ANALYSIS_LABELS[x]
                 )
                 
+                # Options d'envoi de l'image
+                with st.expander("⚙️ Options d'envoi"):
+                    detail_choice = st.radio(
+                        "Niveau de détail:",
+                        ["auto", "low", "high"],
+                        format_func=lambda x: {
+                            "auto": "Automatique (selon le type d'analyse)",
+                            "low": "Faible (vue d'ensemble, coût minimal)",
+                            "high": "Élevé (texte et petits détails)"
+                        }[x]
+                    )
+                    image_format = st.radio("Format d'envoi:", ["JPEG", "WEBP"], horizontal=True)
+                    similarity_threshold = st.slider(
+                        "Seuil de similarité (bits différents sur 64):",
+                        min_value=0,
+                        max_value=16,
+                        value=DEFAULT_HAMMING_THRESHOLD,
+                        help="Une image dont l'empreinte perceptuelle diffère de moins de ce nombre de bits d'une image déjà analysée réutilise son analyse (0 = images identiques uniquement). Non utilisé pour l'extraction de texte, ni pour l'analyse complète qui l'inclut"
+                    )
+                
+                detail = VISION_DETAIL_BY_ANALYSIS.get(analysis_type, "high") if detail_choice == "auto" else detail_choice
+                st.caption(f"🧮 Détail {detail} · environ {estimate_image_tokens(image.size, detail)} tokens pour l'image")
+                
                 # Bouton d'analyse
                 if st.button("🚀 Analyser l'image", key="analyze", type="primary"):
                     with st.spinner("🔄 Analyse en cours..."):
-                        analysis_result = vision_analyze_image(client, image, analysis_type)
+                        if analysis_type == "all":
+                            analysis_result = vision_analyze_all(client, image, detail, image_format, similarity_threshold)
+                        else:
+                            analysis_result = vision_analyze_image(client, image, analysis_type, detail, image_format, similarity_threshold)
                     
                     if analysis_result:
                         st.success("✅ Analyse terminée !")
                         
                         # Affichage du résultat
                         st.markdown("### 📋 Résultat de l'analyse")
-                        st.markdown(analysis_result)
+                        if analysis_type == "all":
+                            for key, section in analysis_result.items():
+                                with st.expander(ANALYSIS_LABELS[key]):
+                                    st.markdown(section)
+                        else:
+                            st.markdown(analysis_result)
                         
                         # Sauvegarder dans la session pour comparaison
                         if 'analyses' not in st.session_state:
                             st.session_state.analyses = []
                         
+                        # Le fichier original est écrit sur disque, seule une vignette reste en mémoire
                         st.session_state.analyses.append({
-                            'image': image.copy(),
+                            'image_id': get_artifact_store().put(uploaded_file.getvalue()),
                             'type': analysis_type,
                             'result': analysis_result,
                             'filename': uploaded_file.name
@@ -250,15 +252,26 @@ if client:
                     col1, col2 = st.columns([1, 2])
                     
                     with col1:
-                        st.image(analysis['image'], caption=analysis['filename'], use_container_width=True)
+                        thumbnail = get_artifact_store().thumbnail(analysis['image_id'])
+                        if thumbnail is not None:
+                            st.image(thumbnail, caption=analysis['filename'], use_container_width=True)
                     
                     with col2:
                         st.markdown("**Type d'analyse:** " + analysis['type'])
                         st.markdown("**Résultat:**")
-                        st.write(analysis['result'])
+                        if isinstance(analysis['result'], dict):
+                            # Toutes les analyses d'un seul appel : un onglet par type
+                            section_tabs = st.tabs([ANALYSIS_LABELS[key] for key in analysis['result']])
+                            for section_tab, section in zip(section_tabs, analysis['result'].values()):
+                                with section_tab:
+                                    st.markdown(section)
+                        else:
+                            st.write(analysis['result'])
             
             # Bouton pour effacer l'historique
             if st.button("🗑️ Effacer l'historique"):
+                for analysis in st.session_state.analyses:
+                    get_artifact_store().discard(analysis['image_id'])
                 st.session_state.analyses = []
                 st.success("Historique effacé !")
                 st.rerun()
@@ -266,6 +279,108 @@ if client:
             st.info("Aucune analyse sauvegardée. Analysez des images dans l'onglet 'Analyser une Image' pour les voir ici.")
 
     with tab3:
+        st.header("🗂️ Analyse par lot")
+        st.markdown("Analysez un catalogue complet : plusieurs images ou une archive ZIP, traitées en parallèle.")
+        
+        batch_files = st.file_uploader(
+            "Images ou archives ZIP",
+            type=['png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'zip'],
+            accept_multiple_files=True,
+            key="batch_files"
+        )
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            batch_type = st.selectbox(
+                "Type d'analyse:",
+                list(ANALYSIS_LABELS),
+                format_func=lambda x: ANALYSIS_LABELS[x],
+                key="batch_type"
+            )
+            batch_detail = st.radio(
+                "Niveau de détail:",
+                ["auto", "low", "high"],
+                horizontal=True,
+                key="batch_detail"
+            )
+        
+        with col2:
+            batch_workers = st.slider("Analyses simultanées", min_value=1, max_value=16, value=4)
+            batch_rate = st.number_input(
+                "Requêtes par minute maximum",
+                min_value=1,
+                max_value=10000,
+                value=DEFAULT_ANALYSES_PER_MINUTE,
+                help="Limite de débit de votre compte OpenAI pour gpt-4o"
+            )
+            batch_threshold = st.slider(
+                "Seuil de similarité des doublons",
+                min_value=0,
+                max_value=16,
+                value=DEFAULT_HAMMING_THRESHOLD,
+                key="batch_threshold",
+                help="Les images quasi identiques à une image déjà analysée réutilisent son analyse (sauf pour l'extraction de texte)"
+            )
+        
+        if st.button("🚀 Lancer l'analyse du lot", key="analyze_batch", type="primary"):
+            if batch_files:
+                total = count_batch_images(batch_files)
+                progress_bar = st.progress(0.0, text=f"Analyse de {total} image(s)...")
+                table_placeholder = st.empty()
+                
+                rows = []
+                errors = 0
+                for row in analyze_batch(
+                    client,
+                    iter_batch_images(batch_files),
+                    analysis_type=batch_type,
+                    detail=None if batch_detail == "auto" else batch_detail,
+                    max_workers=batch_workers,
+                    requests_per_minute=batch_rate,
+                    cache=get_response_cache(),
+                    perceptual_cache=get_perceptual_cache(),
+                    threshold=batch_threshold
+                ):
+                    rows.append(row)
+                    if row["error"]:
+                        errors += 1
+                    
+                    progress_bar.progress(
+                        len(rows) / max(total, 1),
+                        text=f"{len(rows)}/{total} image(s) analysée(s), {errors} erreur(s)"
+                    )
+                    # Tableau rafraîchi par paquets pour ne pas ralentir les très gros lots
+                    if len(rows) % 10 == 1:
+                        table_placeholder.dataframe(rows, use_container_width=True)
+                
+                progress_bar.progress(1.0, text=f"{len(rows)}/{total} image(s) analysée(s), {errors} erreur(s)")
+                table_placeholder.dataframe(rows, use_container_width=True)
+                st.session_state.batch_analyses = rows
+            else:
+                st.warning("Veuillez d'abord uploader des images.")
+        
+        elif st.session_state.get('batch_analyses'):
+            st.dataframe(st.session_state.batch_analyses, use_container_width=True)
+        
+        if st.session_state.get('batch_analyses'):
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    "📥 Exporter en CSV",
+                    data=batch_rows_to_csv(st.session_state.batch_analyses),
+                    file_name="analyses.csv",
+                    mime="text/csv"
+                )
+            with col2:
+                st.download_button(
+                    "📥 Exporter en JSONL",
+                    data=batch_rows_to_jsonl(st.session_state.batch_analyses),
+                    file_name="analyses.jsonl",
+                    mime="application/jsonl"
+                )
+
+    with tab4:
         st.header("ℹ️ Informations sur l'Analyse d'Images")
         
         st.markdown("""
@@ -306,6 +421,11 @@ if client:
         - Aspects techniques
         - Éclairage et perspective
         
+        **🧩 Toutes les analyses**
+        - Les six analyses en un seul appel
+        - L'image n'est envoyée qu'une fois
+        - Résultats comparables dans l'onglet 'Analyse Comparative'
+        
         ### 📋 Formats supportés
         - PNG, JPG, JPEG
         - GIF, BMP
@@ -343,6 +463,8 @@ with st.sidebar:
     - 📝 Reconnaissance de texte
     - 🎨 Analyse artistique
     - ⚙️ Analyse technique
+    - 🧩 Toutes les analyses en un appel
+    - 🗂️ Analyse par lot (ZIP, export CSV/JSONL)
     - 📊 Comparaison d'analyses
     """)
     
@@ -361,6 +483,11 @@ with st.sidebar:
         st.success("Connecté ✅")
     else:
         st.error("Non connecté ❌")
+    
+    # Statistiques du cache de réponses
+    show_cache_stats(get_response_cache(), "Cache de réponses")
+    show_cache_stats(get_perceptual_cache(), "Cache perceptuel")
+    show_artifact_usage(get_artifact_store())
 
 # Style CSS personnalisé
 st.markdown("""
@@ -1,9 +1,20 @@
 import streamlit as st
 import requests
 from io import BytesIO
-from openai import OpenAI
-import tempfile
-import os
+from openai_client import initialize_openai_client
+from response_cache import cached_chat_completion, get_response_cache, show_cache_stats
+from audio_processing import (
+    AUDIO_FORMATS,
+    WHISPER_MAX_BYTES,
+    build_translation_messages,
+    detect_audio_format,
+    format_timestamp,
+    get_cached_transcript,
+    prepare_audio_upload,
+    transcribe_long_audio,
+    translate_text_concurrently
+)
+from tts_engine import get_tts_cache, synthesize_text
 
 # Configuration de la page
 st.set_page_config(
@@ -16,73 +27,53 @@ st.set_page_config(
 st.title("🎵 Traitement Audio avec OpenAI")
 st.markdown("---")
 
-# Configuration de l'API OpenAI avec saisie utilisateur
-def initialize_openai_client(api_key):
-    """Initialise le client OpenAI avec la clé API fournie par l'utilisateur"""
+def openai_transcribe(client, audio_file):
+    """
+    Transcrit un fichier audio en texte
+    
+    Args:
+        client: Client OpenAI initialisé
+        audio_file: Fichier audio à transcrire
+    
+    Returns:
+        str: Transcription du fichier audio
+    """
     try:
-        if not api_key:
-            return None
-        
-        if not api_key.startswith('sk-'):
-            st.error("❌ Format de clé API invalide. La clé doit commencer par 'sk-'")
-            return None
+        # Envoi direct du buffer en mémoire, avec le nom et le type MIME de son format réel
+        transcript = client.audio.transcriptions.create(
+            model="whisper-1",
+            file=prepare_audio_upload(audio_file)
+        )
         
-        # Initialisation du client OpenAI
-        client = OpenAI(api_key=api_key)
+        return transcript.text
         
-        # Test de validation de la clé API
-        try:
-            # Test simple pour vérifier si la clé fonctionne
-            test_response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": "test"}],
-                max_tokens=1
-            )
-            return client
-        except Exception as e:
-            st.error(f"❌ Clé API invalide ou problème de connexion: {str(e)}")
-            return None
-            
     except Exception as e:
-        st.error(f"❌ Erreur lors de l'initialisation du client OpenAI: {str(e)}")
+        st.error(f"❌ Erreur lors de la transcription: {str(e)}")
         return None
 
-def openai_transcribe(client, audio_file):
+def openai_transcribe_long(client, audio_file, max_workers=4, on_progress=None):
     """
-    Transcrit un fichier audio en texte
+    Transcrit un long fichier audio en le découpant aux silences
     
     Args:
         client: Client OpenAI initialisé
         audio_file: Fichier audio à transcrire
+        max_workers: Nombre de segments transcrits en parallèle
+        on_progress: Fonction appelée avec (segments terminés, total)
     
     Returns:
-        str: Transcription du fichier audio
+        dict: Texte complet, segments horodatés et nombre de découpes
     """
     try:
-        # Créer un fichier temporaire pour l'audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-            tmp_file.write(audio_file.read())
-            tmp_file_path = tmp_file.name
-        
-        # Ouvrir le fichier pour la transcription
-        with open(tmp_file_path, "rb") as audio:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=audio
-            )
-        
-        # Nettoyer le fichier temporaire
-        os.unlink(tmp_file_path)
-        
-        return transcript.text
+        return transcribe_long_audio(
+            client,
+            audio_file,
+            audio_format=detect_audio_format(audio_file),
+            max_workers=max_workers,
+            on_progress=on_progress
+        )
         
     except Exception as e:
-        # Nettoyer le fichier temporaire en cas d'erreur
-        if 'tmp_file_path' in locals():
-            try:
-                os.unlink(tmp_file_path)
-            except:
-                pass
         st.error(f"❌ Erreur lors de la transcription: {str(e)}")
         return None
 
@@ -99,66 +90,46 @@ def openai_translate(client, audio_file, target_language="français"):
         str: Traduction du fichier audio
     """
     try:
-        # Créer un fichier temporaire pour l'audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-            tmp_file.write(audio_file.read())
-            tmp_file_path = tmp_file.name
-        
-        # Ouvrir le fichier pour la traduction
-        with open(tmp_file_path, "rb") as audio:
-            translation = client.audio.translations.create(
-                model="whisper-1",
-                file=audio
-            )
-        
-        # Nettoyer le fichier temporaire
-        os.unlink(tmp_file_path)
+        # Envoi direct du buffer en mémoire, avec le nom et le type MIME de son format réel
+        translation = client.audio.translations.create(
+            model="whisper-1",
+            file=prepare_audio_upload(audio_file)
+        )
         
         # Si on veut une autre langue que l'anglais, utiliser GPT pour traduire
         if target_language.lower() != "english" and target_language.lower() != "anglais":
-            chat_response = client.chat.completions.create(
+            return cached_chat_completion(
+                client,
                 model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": f"Tu es un traducteur expert. Traduis le texte suivant en {target_language}."},
-                    {"role": "user", "content": translation.text}
-                ],
+                messages=build_translation_messages(translation.text, target_language),
                 max_tokens=1000
             )
-            return chat_response.choices[0].message.content
         
         return translation.text
         
     except Exception as e:
-        # Nettoyer le fichier temporaire en cas d'erreur
-        if 'tmp_file_path' in locals():
-            try:
-                os.unlink(tmp_file_path)
-            except:
-                pass
         st.error(f"❌ Erreur lors de la traduction: {str(e)}")
         return None
 
-def text_to_speech(client, text, voice="alloy", model="tts-1"):
+def text_to_speech(client, text, voice="alloy", model="tts-1", on_first_chunk=None):
     """
     Convertit un texte en fichier audio
     
+    Les textes longs sont découpés aux fins de phrases et synthétisés en parallèle.
+    Les segments déjà générés avec la même voix et le même modèle sont lus depuis le cache.
+    
     Args:
         client: Client OpenAI initialisé
         text: Texte à convertir en audio
         voice: Voix à utiliser (alloy, echo, fable, onyx, nova, shimmer)
         model: Modèle TTS à utiliser (tts-1 ou tts-1-hd)
+        on_first_chunk: Fonction appelée avec le premier segment audio dès qu'il est prêt
     
     Returns:
-        bytes: Données audio générées
+        dict: Données audio générées, nombre de segments et durées
     """
     try:
-        response = client.audio.speech.create(
-            model=model,
-            voice=voice,
-            input=text
-        )
-        
-        return response.content
+        return synthesize_text(client, text, voice, model, on_first_chunk=on_first_chunk, cache=get_tts_cache())
         
     except Exception as e:
         st.error(f"❌ Erreur lors de la génération audio: {str(e)}")
@@ -203,7 +174,7 @@ if client:
     st.markdown("---")
     
     # Onglets pour différentes fonctionnalités
-    tab1, tab2, tab3, tab4 = st.tabs(["🎤 Transcription", "🌍 Traduction Audio", "🔊 Text-to-Speech", "ℹ️ Informations"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["🎤 Transcription", "🌍 Traduction Audio", "🔁 Transcription + Traductions", "🔊 Text-to-Speech", "ℹ️ Informations"])
 
     with tab1:
         st.header("🎤 Transcription Audio")
@@ -222,23 +193,53 @@ if client:
             )
             
             if audio_file:
-                st.audio(audio_file, format='audio/mp3')
+                st.audio(audio_file, format=AUDIO_FORMATS[detect_audio_format(audio_file)])
                 st.info(f"Fichier: {audio_file.name} ({audio_file.size} bytes)")
         
         with col2:
             st.subheader("📝 Transcription")
             
             if audio_file:
+                # Les fichiers de plus de 25 Mo doivent être découpés avant l'envoi à Whisper
+                chunked_mode = st.checkbox(
+                    "✂️ Découper et transcrire en parallèle",
+                    value=audio_file.size > WHISPER_MAX_BYTES,
+                    help="Recommandé pour les longs enregistrements : le fichier est découpé aux silences et les segments sont transcrits simultanément"
+                )
+                
+                if chunked_mode:
+                    max_workers = st.slider("Segments transcrits en parallèle", min_value=1, max_value=8, value=4)
+                elif audio_file.size > WHISPER_MAX_BYTES:
+                    st.warning("⚠️ Le fichier dépasse 25 Mo : activez le découpage pour le transcrire.")
+                
                 if st.button("🚀 Transcrire", key="transcribe", type="primary"):
                     audio_file.seek(0)  # Reset file pointer
-                    with st.spinner("🔄 Transcription en cours..."):
-                        transcription = openai_transcribe(client, audio_file)
+                    segments = []
+                    if chunked_mode:
+                        progress = st.progress(0.0, text="🔄 Découpage et transcription en cours...")
+                        result = openai_transcribe_long(
+                            client,
+                            audio_file,
+                            max_workers=max_workers,
+                            on_progress=lambda done, total: progress.progress(done / total, text=f"🔄 {done}/{total} segment(s) transcrit(s)")
+                        )
+                        transcription = result["text"] if result else None
+                        segments = result["segments"] if result else []
+                    else:
+                        with st.spinner("🔄 Transcription en cours..."):
+                            transcription = openai_transcribe(client, audio_file)
                     
                     if transcription:
                         st.success("✅ Transcription terminée !")
                         st.markdown("### 📋 Résultat")
                         st.text_area("Transcription:", value=transcription, height=200, disabled=True)
                         
+                        if segments:
+                            with st.expander(f"🕒 Transcription horodatée ({len(segments)} segments)"):
+                                st.text("\n".join(
+                                    f"[{format_timestamp(segment['start'])}] {segment['text']}" for segment in segments
+                                ))
+                        
                         # Bouton de téléchargement
                         st.download_button(
                             label="📥 Télécharger la transcription",
@@ -267,7 +268,7 @@ if client:
             )
             
             if audio_file_translate:
-                st.audio(audio_file_translate, format='audio/mp3')
+                st.audio(audio_file_translate, format=AUDIO_FORMATS[detect_audio_format(audio_file_translate)])
                 st.info(f"Fichier: {audio_file_translate.name} ({audio_file_translate.size} bytes)")
         
         with col2:
@@ -302,6 +303,84 @@ if client:
                 st.info("👆 Veuillez d'abord uploader un fichier audio")
 
     with tab3:
+        st.header("🔁 Transcription + Traductions")
+        st.markdown("Transcrivez un fichier une seule fois et traduisez-le simultanément dans plusieurs langues")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.subheader("📤 Upload Audio")
+            
+            audio_file_combined = st.file_uploader(
+                "Choisissez un fichier audio",
+                type=['mp3', 'wav', 'm4a', 'ogg', 'flac'],
+                help="Formats supportés: MP3, WAV, M4A, OGG, FLAC",
+                key="combined_uploader"
+            )
+            
+            if audio_file_combined:
+                st.audio(audio_file_combined, format=AUDIO_FORMATS[detect_audio_format(audio_file_combined)])
+                st.info(f"Fichier: {audio_file_combined.name} ({audio_file_combined.size} bytes)")
+        
+        with col2:
+            st.subheader("🔄 Transcription et traductions")
+            
+            if audio_file_combined:
+                target_langs = st.multiselect(
+                    "Langues cibles:",
+                    ["français", "english", "español", "deutsch", "italiano", "português", "русский", "中文", "日本語"],
+                    default=["français", "english"],
+                    help="Chaque traduction est réalisée en parallèle à partir de la même transcription"
+                )
+                
+                if st.button("🚀 Transcrire et traduire", key="transcribe_translate", type="primary"):
+                    try:
+                        with st.spinner("🔄 Transcription en cours..."):
+                            transcript, from_cache = get_cached_transcript(client, audio_file_combined)
+                        
+                        with st.spinner(f"🔄 Traduction en {len(target_langs)} langue(s)..."):
+                            translations = translate_text_concurrently(client, transcript, target_langs)
+                        
+                        st.session_state.combined_result = {
+                            "file_name": audio_file_combined.name,
+                            "transcript": transcript,
+                            "from_cache": from_cache,
+                            "translations": translations
+                        }
+                    except Exception as e:
+                        st.error(f"❌ Erreur lors de la transcription: {str(e)}")
+                
+                combined_result = st.session_state.get("combined_result")
+                if combined_result and combined_result["file_name"] == audio_file_combined.name:
+                    if combined_result["from_cache"]:
+                        st.caption("💾 Transcription réutilisée depuis le cache (aucun appel Whisper)")
+                    
+                    result_tabs = st.tabs(["📝 Transcription"] + list(combined_result["translations"]))
+                    
+                    with result_tabs[0]:
+                        st.text_area("Transcription:", value=combined_result["transcript"], height=200, disabled=True, key="combined_transcript")
+                        st.download_button(
+                            label="📥 Télécharger la transcription",
+                            data=combined_result["transcript"],
+                            file_name="transcription.txt",
+                            mime="text/plain",
+                            key="download_combined_transcript"
+                        )
+                    
+                    for result_tab, (language, translated_text) in zip(result_tabs[1:], combined_result["translations"].items()):
+                        with result_tab:
+                            st.text_area("Traduction:", value=translated_text, height=200, disabled=True, key=f"combined_{language}")
+                            st.download_button(
+                                label="📥 Télécharger la traduction",
+                                data=translated_text,
+                                file_name=f"traduction_{language}.txt",
+                                mime="text/plain",
+                                key=f"download_combined_{language}"
+                            )
+            else:
+                st.info("👆 Veuillez d'abord uploader un fichier audio")
+
+    with tab4:
         st.header("🔊 Text-to-Speech")
         st.markdown("Convertissez votre texte en audio avec les voix d'OpenAI")
         
@@ -337,13 +416,26 @@ if client:
             
             if text_input.strip():
                 if st.button("🚀 Générer l'audio", key="tts", type="primary"):
+                    # Le premier segment est joué pendant la synthèse des suivants
+                    player = st.empty()
+                    
+                    def play_first_chunk(first_audio):
+                        with player.container():
+                            st.caption("▶️ Début de l'audio (joué pendant la génération de la suite)")
+                            st.audio(first_audio, format='audio/mp3')
+                    
                     with st.spinner("🔄 Génération audio en cours..."):
-                        audio_data = text_to_speech(client, text_input, voice, model)
+                        tts_result = text_to_speech(client, text_input, voice, model, on_first_chunk=play_first_chunk)
+                    
+                    audio_data = tts_result["audio"] if tts_result else None
                     
                     if audio_data:
                         st.success("✅ Audio généré !")
                         
-                        # Lecture audio
+                        # Lecture audio : le lecteur du premier segment est conservé pour ne pas
+                        # interrompre l'écoute, l'audio complet s'affiche dans un lecteur séparé
+                        if tts_result['chunks'] > 1:
+                            st.caption("🎧 Audio complet")
                         st.audio(audio_data, format='audio/mp3')
                         
                         # Bouton de téléchargement
@@ -356,10 +448,17 @@ if client:
                         
                         # Informations
                         st.info(f"🎵 Voix utilisée: {voice} | Modèle: {model}")
+                        st.caption(
+                            f"{tts_result['chunks']} segment(s) · premier audio en {tts_result['time_to_first_audio']:.1f} s "
+                            f"· total {tts_result['total_time']:.1f} s"
+                        )
             else:
                 st.info("👆 Veuillez d'abord entrer un texte")
+            
+            # Statistiques du cache audio
+            show_cache_stats(get_tts_cache(), "Cache audio")
 
-    with tab4:
+    with tab5:
         st.header("ℹ️ Informations sur le Traitement Audio")
         
         st.markdown("""
@@ -409,7 +508,7 @@ if client:
         - Parlez clairement et distinctement
         
         **🔊 Pour Text-to-Speech:**
-        - Limitez le texte à 4096 caractères max
+        - Les textes longs sont découpés aux fins de phrases et générés en parallèle
         - Utilisez une ponctuation appropriée
         - Testez différentes voix pour trouver celle qui convient
         """)
@@ -455,6 +554,10 @@ with st.sidebar:
         st.success("Connecté ✅")
     else:
         st.error("Non connecté ❌")
+    
+    # Statistiques des caches
+    show_cache_stats(get_response_cache(), "Cache de réponses")
+    show_cache_stats(get_tts_cache(), "Cache audio")
 
 # Style CSS personnalisé
 st.markdown("""
@@ -0,0 +1,220 @@
+import asyncio
+import time
+from io import BytesIO
+
+import httpx
+from openai import AsyncOpenAI
+from PIL import Image
+
+from response_cache import cached_chat_completion_async
+from vision_encoding import encode_for_vision
+
+STORY_MODEL = "gpt-4"
+IMAGE_MODEL = "dall-e-3"
+VISION_MODEL = "gpt-4o"
+
+STORY_SYSTEM_PROMPT = """Tu es un expert en création d'histoires et en génération d'images.
+                 Ta mission est d'améliorer et de compléter un prompt d'histoire fourni par l'utilisateur.
+                 Tu dois:
+                 1. Enrichir l'histoire avec des détails visuels
+                 2. Ajouter des éléments narratifs captivants
+                 3. Créer une description qui sera parfaite pour générer une image
+                 4. Garder l'essence de l'idée originale
+                 5. Répondre en français
+                 6. IMPORTANT: Éviter tout contenu violent, politique, sexuel ou inapproprié
+                 7. Privilégier des thèmes positifs, créatifs et familiaux
+
+                 Ton amélioration doit être créative, détaillée, visuellement riche et adaptée à DALL-E."""
+
+DESCRIPTION_PROMPT = "Décris cette image en détail. Raconte ce que tu vois, l'atmosphère, les couleurs, les personnages, l'action qui se déroule. Sois créatif et narratif dans ta description."
+
+# Étapes du pipeline, dans l'ordre d'exécution
+PIPELINE_STAGES = ["story", "image", "download", "description"]
+
+
+def build_story_messages(user_prompt):
+    """Construit les messages envoyés à GPT-4 pour améliorer une idée d'histoire"""
+    return [
+        {"role": "system", "content": STORY_SYSTEM_PROMPT},
+        {"role": "user", "content": f"Améliore et complète cette idée d'histoire en évitant tout contenu inapproprié: {user_prompt}"}
+    ]
+
+
+def build_description_messages(image_url, detail="high"):
+    """Construit les messages envoyés à GPT-4 Vision pour décrire une image (URL ou data URL, voir encode_for_vision)"""
+    return [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": DESCRIPTION_PROMPT
+                },
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image_url,
+                        "detail": detail
+                    }
+                }
+            ]
+        }
+    ]
+
+
+def clean_prompt_for_dalle(prompt):
+    """Nettoie et optimise le prompt pour DALL-E"""
+    cleaned_prompt = prompt.lower()
+
+    # Remplacer les mots problématiques par des alternatives
+    replacements = {
+        "violent": "énergique",
+        "violence": "action",
+        "sang": "rouge",
+        "mort": "endormi",
+        "tuer": "vaincre",
+        "guerre": "conflit",
+        "arme": "outil",
+        "politique": "gouvernement",
+        "religion": "spiritualité",
+        "drogue": "potion",
+        "alcool": "boisson",
+        "cigarette": "bâton",
+        "tabac": "herbe"
+    }
+
+    for word, replacement in replacements.items():
+        cleaned_prompt = cleaned_prompt.replace(word, replacement)
+
+    # Limiter la longueur du prompt (DALL-E a une limite)
+    if len(cleaned_prompt) > 1000:
+        cleaned_prompt = cleaned_prompt[:1000] + "..."
+
+    # Ajouter des termes positifs pour améliorer la génération
+    positive_terms = "artistic, beautiful, detailed, high quality, masterpiece"
+    cleaned_prompt = f"{cleaned_prompt}, {positive_terms}"
+
+    return cleaned_prompt
+
+
+async def _run_scene(client, http, index, idea, settings, semaphore):
+    """Exécute histoire → image → téléchargement → description pour une scène"""
+    result = {
+        "index": index,
+        "idea": idea,
+        "story": None,
+        "image_url": None,
+        "image_bytes": None,
+        "description": None,
+        "timings": {},
+        "error": None
+    }
+
+    async with semaphore:
+        scene_start = time.perf_counter()
+        try:
+            stage_start = time.perf_counter()
+            result["story"] = await cached_chat_completion_async(
+                client,
+                model=STORY_MODEL,
+                messages=build_story_messages(idea),
+                use_cache=settings["use_cache"],
+                max_tokens=500,
+                temperature=settings["creativity_level"]
+            )
+            result["timings"]["story"] = time.perf_counter() - stage_start
+
+            stage_start = time.perf_counter()
+            response = await client.images.generate(
+                model=IMAGE_MODEL,
+                prompt=clean_prompt_for_dalle(result["story"]),
+                size=settings["size"],
+                quality=settings["quality"],
+                n=1
+            )
+            result["image_url"] = response.data[0].url
+            result["timings"]["image"] = time.perf_counter() - stage_start
+
+            # Le téléchargement démarre dès que l'URL est connue
+            stage_start = time.perf_counter()
+            image_response = await http.get(result["image_url"])
+            image_response.raise_for_status()
+            result["image_bytes"] = image_response.content
+            result["timings"]["download"] = time.perf_counter() - stage_start
+
+            if settings["describe"]:
+                stage_start = time.perf_counter()
+                # Réduction et encodage JPEG hors de la boucle d'événements
+                image_url = await asyncio.to_thread(
+                    encode_for_vision,
+                    Image.open(BytesIO(result["image_bytes"]))
+                )
+                result["description"] = await cached_chat_completion_async(
+                    client,
+                    model=VISION_MODEL,
+                    messages=build_description_messages(image_url),
+                    max_tokens=500
+                )
+                result["timings"]["description"] = time.perf_counter() - stage_start
+
+        except Exception as e:
+            result["error"] = str(e)
+
+        result["timings"]["total"] = time.perf_counter() - scene_start
+
+    return result
+
+
+async def run_storyboard_async(api_key, ideas, max_concurrency=3, size="1024x1024", quality="standard",
+                               creativity_level=0.8, describe=True, use_cache=None, on_result=None):
+    """
+    Génère plusieurs scènes en parallèle
+
+    Args:
+        api_key: Clé API OpenAI
+        ideas: Liste des idées de scènes
+        max_concurrency: Nombre maximum de scènes traitées simultanément
+        size, quality: Paramètres DALL-E
+        creativity_level: Température utilisée pour l'amélioration des histoires
+        describe: Ajoute une description GPT-4 Vision de chaque image
+        use_cache: Réutilise les histoires déjà générées pour une même idée (par défaut
+            seulement si creativity_level vaut 0 : une histoire échantillonnée est redemandée)
+        on_result: Fonction appelée avec chaque résultat dès qu'une scène est terminée
+
+    Returns:
+        list: Un dictionnaire par scène (histoire, image, durées par étape, erreur éventuelle),
+        dans l'ordre des idées
+    """
+    if use_cache is None:
+        use_cache = creativity_level == 0
+
+    settings = {
+        "size": size,
+        "quality": quality,
+        "creativity_level": creativity_level,
+        "describe": describe,
+        "use_cache": use_cache
+    }
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency * 2, max_keepalive_connections=max_concurrency)
+
+    async with AsyncOpenAI(api_key=api_key) as client, \
+            httpx.AsyncClient(limits=limits, timeout=httpx.Timeout(60.0, connect=5.0)) as http:
+        tasks = [
+            asyncio.create_task(_run_scene(client, http, index, idea, settings, semaphore))
+            for index, idea in enumerate(ideas)
+        ]
+
+        results = []
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+    return sorted(results, key=lambda r: r["index"])
+
+
+def run_storyboard(api_key, ideas, **kwargs):
+    """Version synchrone de run_storyboard_async, utilisable depuis un script Streamlit"""
+    return asyncio.run(run_storyboard_async(api_key, ideas, **kwargs))
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from response_cache import CACHE_DIR, DiskCache
+
+# Nombre maximum de caractères acceptés par l'API TTS en un appel
+TTS_MAX_CHARS = 4096
+# Le premier segment est volontairement court pour démarrer la lecture au plus vite
+FIRST_CHUNK_CHARS = 300
+# Taille maximale du cache des fichiers audio générés
+TTS_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…;:])\s+")
+
+
+def split_sentences(text):
+    """Découpe un texte en phrases (la ponctuation finale est conservée)"""
+    return [sentence for sentence in _SENTENCE_END.split(text.strip()) if sentence]
+
+
+def _split_long_sentence(sentence, max_chars):
+    """Découpe aux espaces une phrase plus longue que max_chars"""
+    parts = []
+    current = ""
+    for word in sentence.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            parts.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+
+        # Un mot seul plus long que la limite est coupé brutalement
+        while len(current) > max_chars:
+            parts.append(current[:max_chars])
+            current = current[max_chars:]
+
+    if current:
+        parts.append(current)
+    return parts
+
+
+def chunk_text(text, max_chars=TTS_MAX_CHARS, first_chunk_chars=FIRST_CHUNK_CHARS):
+    """
+    Regroupe les phrases d'un texte en segments synthétisables
+
+    Les segments respectent les fins de phrases et ne dépassent pas max_chars.
+    Le premier segment est limité à first_chunk_chars pour réduire le délai
+    avant le début de la lecture.
+
+    Returns:
+        list: Segments de texte, dans l'ordre
+    """
+    chunks = []
+    current = ""
+
+    for sentence in split_sentences(text):
+        limit = first_chunk_chars if not chunks else max_chars
+        pieces = _split_long_sentence(sentence, max_chars) if len(sentence) > max_chars else [sentence]
+
+        for piece in pieces:
+            if current and len(current) + 1 + len(piece) > limit:
+                chunks.append(current)
+                current = piece
+                limit = max_chars
+            else:
+                current = f"{current} {piece}" if current else piece
+
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@st.cache_resource(show_spinner=False)
+def get_tts_cache():
+    """Retourne le cache des fichiers MP3 générés, partagé par toutes les sessions"""
+    return DiskCache(os.path.join(CACHE_DIR, "tts.sqlite3"), TTS_CACHE_MAX_BYTES)
+
+
+def tts_cache_key(text, voice, model):
+    """Clé de cache d'un segment : sha256(texte, voix, modèle)"""
+    payload = json.dumps([text, voice, model], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def synthesize_chunk(client, text, voice="alloy", model="tts-1", cache=None):
+    """Synthétise un segment de texte et retourne les données MP3 (servies depuis le cache si possible)"""
+    if cache is not None:
+        key = tts_cache_key(text, voice, model)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    response = client.audio.speech.create(
+        model=model,
+        voice=voice,
+        input=text,
+        response_format="mp3"
+    )
+
+    if cache is not None:
+        cache.set(key, response.content)
+
+    return response.content
+
+
+def synthesize_text(client, text, voice="alloy", model="tts-1", max_workers=4, on_first_chunk=None, cache=None):
+    """
+    Synthétise un texte de longueur quelconque en segments traités en parallèle
+
+    Tous les segments sont envoyés simultanément (dans la limite de max_workers).
+    Dès que le premier est prêt, il est transmis à on_first_chunk pour pouvoir
+    être joué pendant que les suivants sont encore en cours de synthèse.
+    Les trames MP3 se concatènent sans réencodage : le fichier final est la simple
+    juxtaposition des segments.
+
+    Args:
+        client: Client OpenAI initialisé
+        text: Texte à convertir
+        voice: Voix à utiliser
+        model: Modèle TTS
+        max_workers: Nombre maximum de segments synthétisés simultanément
+        on_first_chunk: Fonction appelée avec les données MP3 du premier segment
+        cache: DiskCache des segments déjà synthétisés (voir get_tts_cache)
+
+    Returns:
+        dict: Données MP3 complètes, nombre de segments et délai avant le premier segment
+    """
+    start_time = time.perf_counter()
+    chunks = chunk_text(text)
+    if not chunks:
+        raise ValueError("Le texte à synthétiser est vide")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(synthesize_chunk, client, chunk, voice, model, cache) for chunk in chunks]
+
+        first_audio = futures[0].result()
+        time_to_first_audio = time.perf_counter() - start_time
+        if on_first_chunk is not None and len(futures) > 1:
+            on_first_chunk(first_audio)
+
+        audio_parts = [first_audio] + [future.result() for future in futures[1:]]
+
+    return {
+        "audio": b"".join(audio_parts),
+        "chunks": len(chunks),
+        "time_to_first_audio": time_to_first_audio,
+        "total_time": time.perf_counter() - start_time
+    }
@@ -0,0 +1,244 @@
+import csv
+import io
+import json
+import zipfile
+
+from PIL import Image
+
+from batch_executor import run_bounded
+from response_cache import cached_chat_completion
+from vision_encoding import VISION_DETAIL_BY_ANALYSIS, vision_image_content
+
+ANALYSIS_MODEL = "gpt-4o"
+
+# Prompt de chaque type d'analyse
+ANALYSIS_PROMPTS = {
+    "general": "Décris cette image de manière détaillée. Que vois-tu ?",
+    "objects": "Identifie et liste tous les objets visibles dans cette image. Sois précis et méthodique.",
+    "text": "Y a-t-il du texte dans cette image ? Si oui, transcris-le et explique son contexte.",
+    "detailed": "Fais une analyse complète et détaillée de cette image : objets, personnes, couleurs, composition, style, ambiance, texte éventuel, et tout autre élément notable.",
+    "artistic": "Analyse cette image d'un point de vue artistique : composition, couleurs, style, technique, émotion transmise.",
+    "technical": "Analyse les aspects techniques de cette image : qualité, éclairage, perspective, mise au point, etc."
+}
+
+# Extensions reconnues dans une archive ZIP
+BATCH_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp")
+# Les fichiers plus volumineux sont ignorés (limite de l'API Vision)
+BATCH_MAX_IMAGE_BYTES = 20 * 1024 * 1024
+DEFAULT_ANALYSES_PER_MINUTE = 100
+
+# Analyses qui transcrivent le texte de l'image : deux documents de même mise en page
+# (factures d'un même modèle, formulaires...) ont des empreintes perceptuelles très
+# proches mais un texte différent, le cache perceptuel n'est donc pas utilisé
+TEXT_ANALYSES = {"text", "all"}
+
+
+def build_all_analyses_prompt():
+    """Construit la consigne demandant toutes les analyses dans un seul objet JSON"""
+    sections = "\n".join(f'- "{key}": {prompt}' for key, prompt in ANALYSIS_PROMPTS.items())
+    return (
+        "Réalise plusieurs analyses de cette image et réponds uniquement avec un objet JSON "
+        "dont chaque clé contient l'analyse correspondante, rédigée en Markdown :\n"
+        f"{sections}"
+    )
+
+
+def parse_all_analyses(content):
+    """
+    Extrait les analyses de la réponse JSON du modèle
+
+    Returns:
+        dict: Analyse (texte) par type, dans l'ordre de ANALYSIS_PROMPTS
+
+    Raises:
+        ValueError: Si la réponse n'est pas un objet JSON valide
+    """
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Réponse JSON invalide : {e}") from e
+    if not isinstance(data, dict):
+        raise ValueError("La réponse n'est pas un objet JSON")
+
+    analyses = {}
+    for key in ANALYSIS_PROMPTS:
+        value = data.get(key, "")
+        # Une section structurée (liste d'objets...) est conservée sous forme lisible
+        analyses[key] = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, indent=2)
+    return analyses
+
+
+def request_analysis(client, image, analysis_type="general", detail=None, image_format="JPEG", cache=None,
+                     perceptual_cache=None, threshold=None):
+    """
+    Envoie une demande d'analyse à l'API Vision
+
+    Les erreurs sont propagées : cette fonction peut être appelée depuis un thread
+    de travail, en passant explicitement le cache de réponses.
+
+    Args:
+        client: Client OpenAI initialisé
+        image: Image PIL à analyser
+        analysis_type: Type d'analyse (clé de ANALYSIS_PROMPTS, ou "all" pour toutes)
+        detail: Niveau de détail ("low" ou "high"), choisi selon le type d'analyse si absent
+        image_format: Format d'envoi de l'image ("JPEG" ou "WEBP")
+        cache: Cache de réponses (par défaut le cache partagé)
+        perceptual_cache: PerceptualCache servant les images quasi identiques sans appel à l'API
+            (ignoré pour les analyses qui transcrivent du texte, voir TEXT_ANALYSES)
+        threshold: Distance de Hamming maximale (par défaut celle du cache perceptuel)
+
+    Returns:
+        str | dict: Analyse, ou analyse par type pour "all"
+    """
+    if detail is None:
+        detail = VISION_DETAIL_BY_ANALYSIS.get(analysis_type, "high")
+
+    if analysis_type in TEXT_ANALYSES:
+        perceptual_cache = None
+
+    if perceptual_cache is not None:
+        namespace = f"{analysis_type}:{detail}"
+        image_hash = perceptual_cache.image_hash(image)
+        cached = perceptual_cache.get(image_hash, namespace, threshold)
+        if cached is not None:
+            return dict(cached) if isinstance(cached, dict) else cached
+
+    if analysis_type == "all":
+        prompt = build_all_analyses_prompt()
+        # La réponse n'est mise en cache que si elle est complète et décodable
+        params = {"response_format": {"type": "json_object"}, "max_tokens": 3000,
+                  "validate": parse_all_analyses}
+    else:
+        prompt = ANALYSIS_PROMPTS.get(analysis_type, ANALYSIS_PROMPTS["general"])
+        params = {"max_tokens": 500}
+
+    # L'image est réduite à la résolution effective du niveau de détail et encodée avec perte
+    content = cached_chat_completion(
+        client,
+        model=ANALYSIS_MODEL,
+        messages=[
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    },
+                    vision_image_content(image, detail, image_format)
+                ]
+            }
+        ],
+        cache=cache,
+        **params
+    )
+
+    result = parse_all_analyses(content) if analysis_type == "all" else content
+
+    if perceptual_cache is not None:
+        perceptual_cache.set(image_hash, namespace, result)
+
+    return result
+
+
+def _is_batch_image(member):
+    """Indique si une entrée d'archive ZIP est une image à analyser"""
+    name = member.filename
+    return not (member.is_dir() or name.startswith("__MACOSX/")
+                or not name.lower().endswith(BATCH_IMAGE_EXTENSIONS)
+                or member.file_size > BATCH_MAX_IMAGE_BYTES)
+
+
+def count_batch_images(uploaded_files):
+    """Compte les images d'un lot (seul le répertoire des archives ZIP est lu)"""
+    count = 0
+    for uploaded_file in uploaded_files:
+        if uploaded_file.name.lower().endswith(".zip"):
+            with zipfile.ZipFile(uploaded_file) as archive:
+                count += sum(1 for member in archive.infolist() if _is_batch_image(member))
+        else:
+            count += 1
+    return count
+
+
+def iter_batch_images(uploaded_files):
+    """
+    Parcourt les images d'un lot de fichiers uploadés, archives ZIP comprises
+
+    Le contenu de chaque image n'est lu qu'au moment où elle est demandée : associé à
+    run_bounded, seules quelques images sont en mémoire à la fois.
+
+    Yields:
+        tuple: (nom du fichier, contenu en bytes)
+    """
+    for uploaded_file in uploaded_files:
+        if uploaded_file.name.lower().endswith(".zip"):
+            with zipfile.ZipFile(uploaded_file) as archive:
+                for member in archive.infolist():
+                    if _is_batch_image(member):
+                        yield member.filename, archive.read(member)
+        else:
+            yield uploaded_file.name, uploaded_file.getvalue()
+
+
+def analyze_batch(client, images, analysis_type="general", detail=None, image_format="JPEG",
+                  max_workers=4, requests_per_minute=DEFAULT_ANALYSES_PER_MINUTE, cache=None,
+                  perceptual_cache=None, threshold=None):
+    """
+    Analyse un lot d'images en parallèle, dans la limite de débit du compte
+
+    Args:
+        client: Client OpenAI initialisé
+        images: Itérable de (nom, contenu), par exemple iter_batch_images(...)
+        analysis_type, detail, image_format: Voir request_analysis
+        max_workers: Nombre d'analyses simultanées
+        requests_per_minute: Débit maximum (None pour ne pas limiter)
+        cache: Cache de réponses, à passer explicitement (les analyses tournent dans des threads)
+        perceptual_cache, threshold: Voir request_analysis (les doublons déjà analysés sont servis sans appel)
+
+    Yields:
+        dict: Une ligne de résultat par image, dans l'ordre de terminaison
+    """
+    names = []
+
+    def images_with_names():
+        for name, data in images:
+            names.append(name)
+            yield data
+
+    def analyze(data):
+        image = Image.open(io.BytesIO(data))
+        result = request_analysis(client, image, analysis_type, detail, image_format, cache,
+                                  perceptual_cache, threshold)
+        return image.size, result
+
+    for index, output, error in run_bounded(
+        analyze,
+        images_with_names(),
+        max_workers=max_workers,
+        requests_per_minute=requests_per_minute
+    ):
+        row = {"filename": names[index], "width": None, "height": None, "error": str(error) if error else ""}
+        if error is None:
+            (row["width"], row["height"]), result = output
+            if isinstance(result, dict):
+                row.update(result)
+            else:
+                row[analysis_type] = result
+        yield row
+
+
+def batch_rows_to_csv(rows):
+    """Exporte les résultats d'un lot au format CSV (une colonne par type d'analyse)"""
+    analysis_columns = [key for key in ANALYSIS_PROMPTS if any(key in row for row in rows)]
+    columns = ["filename", "width", "height"] + analysis_columns + ["error"]
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8-sig")
+
+
+def batch_rows_to_jsonl(rows):
+    """Exporte les résultats d'un lot au format JSON Lines"""
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
@@ -0,0 +1,114 @@
+import base64
+from io import BytesIO
+
+from PIL import Image
+
+# Résolution effective de l'API Vision en détail "high" : l'image est ramenée dans
+# un carré de 2048 px, puis son petit côté à 768 px, avant d'être découpée en tuiles de 512 px
+HIGH_DETAIL_MAX_SIDE = 2048
+HIGH_DETAIL_SHORT_SIDE = 768
+TILE_SIZE = 512
+# En détail "low", l'image est analysée en une seule vignette de 512 px
+LOW_DETAIL_SIDE = 512
+
+# Coût en tokens d'une image (base + coût par tuile en détail "high")
+BASE_IMAGE_TOKENS = 85
+TILE_TOKENS = 170
+
+# Qualités essayées successivement tant que l'image dépasse VISION_TARGET_BYTES
+VISION_QUALITY_STEPS = (85, 70, 55)
+VISION_TARGET_BYTES = 400 * 1024
+
+VISION_FORMATS = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp"
+}
+
+# Niveau de détail par type d'analyse : le détail "low" suffit pour une vue d'ensemble
+VISION_DETAIL_BY_ANALYSIS = {
+    "general": "low",
+    "objects": "high",
+    "text": "high",
+    "detailed": "high",
+    "artistic": "low",
+    "technical": "high"
+}
+
+
+def vision_resolution(image_size, detail="high"):
+    """Calcule la taille à laquelle l'API analysera réellement l'image (jamais agrandie)"""
+    width, height = image_size
+
+    if detail == "low":
+        scale = LOW_DETAIL_SIDE / max(width, height)
+    else:
+        scale = min(HIGH_DETAIL_MAX_SIDE / max(width, height), HIGH_DETAIL_SHORT_SIDE / min(width, height))
+
+    if scale >= 1.0:
+        return width, height
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def estimate_image_tokens(image_size, detail="high"):
+    """Estime le nombre de tokens facturés pour une image"""
+    if detail == "low":
+        return BASE_IMAGE_TOKENS
+
+    width, height = vision_resolution(image_size, detail)
+    tiles = -(-width // TILE_SIZE) * -(-height // TILE_SIZE)
+    return BASE_IMAGE_TOKENS + TILE_TOKENS * tiles
+
+
+def encode_for_vision(image, detail="high", image_format="JPEG",
+                      quality_steps=VISION_QUALITY_STEPS, target_bytes=VISION_TARGET_BYTES):
+    """
+    Prépare une image pour l'API Vision
+
+    L'image est réduite à la résolution effective du niveau de détail demandé,
+    puis encodée avec perte : la qualité est abaissée par paliers tant que le
+    fichier dépasse target_bytes.
+
+    Args:
+        image: Image PIL
+        detail: Niveau de détail ("low" ou "high")
+        image_format: "JPEG" ou "WEBP"
+        quality_steps: Qualités essayées, de la meilleure à la plus compacte
+        target_bytes: Taille visée pour le fichier encodé
+
+    Returns:
+        str: URL data:... prête à être insérée dans un message
+    """
+    size = vision_resolution(image.size, detail)
+    if size != image.size:
+        image = image.resize(size, Image.Resampling.LANCZOS)
+
+    # JPEG ne gère pas la transparence : elle est aplatie sur un fond blanc
+    if image.mode in ("RGBA", "LA", "P"):
+        rgba = image.convert("RGBA")
+        if image_format == "WEBP":
+            image = rgba
+        else:
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    for quality in quality_steps:
+        buffer = BytesIO()
+        image.save(buffer, format=image_format, quality=quality)
+        if buffer.getbuffer().nbytes <= target_bytes:
+            break
+
+    image_base64 = base64.b64encode(buffer.getbuffer()).decode("ascii")
+    return f"data:{VISION_FORMATS[image_format]};base64,{image_base64}"
+
+
+def vision_image_content(image, detail="high", image_format="JPEG"):
+    """Construit le bloc image_url d'un message Vision à partir d'une image PIL"""
+    return {
+        "type": "image_url",
+        "image_url": {
+            "url": encode_for_vision(image, detail, image_format),
+            "detail": detail
+        }
+    }
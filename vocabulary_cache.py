@@ -0,0 +1,214 @@
+import mmap
+import os
+import struct
+import threading
+from array import array
+from collections import OrderedDict
+
+# Nombre maximum de résultats gardés en mémoire (LRU)
+VOCABULARY_CACHE_MAX_ENTRIES = 100_000
+
+# Opérations mémorisées, dans l'ordre des champs d'un enregistrement du fichier
+OPERATIONS = ("stem", "lemma")
+
+# Format du fichier : en-tête (signature, nombre de mots), table des positions
+# (entiers 32 bits natifs), puis les enregistrements "mot\0racine\0lemme" triés par mot
+_MAGIC = b"VOC1"
+_HEADER = struct.Struct("<4sI")
+
+
+class VocabularyCache:
+    """
+    Table mot → racine/lemme, bornée en mémoire et éventuellement persistée sur disque
+
+    Les résultats sont mémorisés par (opération, mot) dans un LRU de max_entries
+    entrées. Si path est donné, le vocabulaire déjà enregistré est projeté en mémoire
+    (mmap) à l'ouverture et consulté par recherche dichotomique : il n'est pas chargé,
+    et les pages sont partagées entre les processus qui lisent le même fichier.
+    Les nouveaux résultats sont ajoutés au fichier par save().
+    """
+
+    def __init__(self, path=None, max_entries=VOCABULARY_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        # Résultats calculés depuis la dernière sauvegarde, par mot
+        self._new = {}
+        self._lock = threading.Lock()
+
+        self._file = None
+        self._map = None
+        self._offsets = None
+        self._records_start = 0
+        self._open()
+
+    def _open(self):
+        """Projette en mémoire le fichier de vocabulaire s'il existe"""
+        if not self.path or not os.path.exists(self.path) or os.path.getsize(self.path) < _HEADER.size:
+            return
+
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC:
+            self._close()
+            return
+
+        offsets_end = _HEADER.size + 4 * (count + 1)
+        self._offsets = memoryview(self._map)[_HEADER.size:offsets_end].cast("I")
+        self._records_start = offsets_end
+
+    def _close(self):
+        if self._offsets is not None:
+            self._offsets.release()
+            self._offsets = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _record(self, index):
+        """Retourne les champs (bytes) de l'enregistrement n° index du fichier"""
+        start = self._records_start + self._offsets[index]
+        end = self._records_start + self._offsets[index + 1]
+        return self._map[start:end].split(b"\0")
+
+    def _find(self, word):
+        """Recherche dichotomique d'un mot dans le fichier (champs décodés, ou None)"""
+        if self._offsets is None:
+            return None
+
+        key = word.encode("utf-8")
+        low, high = 0, len(self._offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            fields = self._record(middle)
+            if fields[0] < key:
+                low = middle + 1
+            elif fields[0] > key:
+                high = middle
+            else:
+                return [field.decode("utf-8") for field in fields[1:]]
+        return None
+
+    def lookup(self, word, operation, compute):
+        """
+        Retourne le résultat d'une opération sur un mot, calculé une seule fois
+
+        Args:
+            word: Token à transformer
+            operation: "stem" ou "lemma"
+            compute: Fonction appelée avec le mot si le résultat n'est pas connu
+
+        Returns:
+            str: Racine ou lemme du mot
+        """
+        key = (operation, word)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+            stored = self._find(word)
+            result = stored[OPERATIONS.index(operation)] if stored else None
+            if result:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if not result:
+            result = compute(word)
+            with self._lock:
+                self._new.setdefault(word, {})[operation] = result
+
+        with self._lock:
+            self._entries[key] = result
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return result
+
+    def drain_new(self):
+        """Retourne et oublie les résultats calculés depuis le dernier appel (pour les fusionner ailleurs)"""
+        with self._lock:
+            new, self._new = self._new, {}
+        return new
+
+    def update(self, new):
+        """Ajoute des résultats calculés ailleurs (par exemple par un processus de travail) à la prochaine sauvegarde"""
+        with self._lock:
+            for word, results in new.items():
+                self._new.setdefault(word, {}).update(results)
+
+    def save(self, path=None):
+        """
+        Fusionne les nouveaux résultats avec le fichier de vocabulaire et l'écrit
+
+        Le fichier est réécrit dans un fichier temporaire puis remplacé, pour que
+        les processus qui le lisent ne voient jamais un fichier partiel.
+        """
+        path = path or self.path
+        if not path:
+            raise ValueError("Aucun fichier de vocabulaire indiqué")
+
+        with self._lock:
+            vocabulary = {}
+            if self._offsets is not None:
+                for index in range(len(self._offsets) - 1):
+                    fields = self._record(index)
+                    vocabulary[fields[0]] = fields[1:]
+
+            for word, results in self._new.items():
+                key = word.encode("utf-8")
+                fields = vocabulary.get(key, [b""] * len(OPERATIONS))
+                for operation, result in results.items():
+                    fields[OPERATIONS.index(operation)] = result.encode("utf-8")
+                vocabulary[key] = fields
+
+            offsets = array("I", [0])
+            records = bytearray()
+            for key in sorted(vocabulary):
+                records += b"\0".join([key, *vocabulary[key]])
+                offsets.append(len(records))
+
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            temporary_path = f"{path}.{os.getpid()}.tmp"
+            with open(temporary_path, "wb") as file:
+                file.write(_HEADER.pack(_MAGIC, len(vocabulary)))
+                file.write(offsets.tobytes())
+                file.write(records)
+
+            # Le fichier projeté doit être fermé avant d'être remplacé (Windows)
+            self._close()
+            os.replace(temporary_path, path)
+            self.path = path
+            self._new = {}
+            self._open()
+
+    def close(self):
+        """Libère la projection du fichier de vocabulaire"""
+        with self._lock:
+            self._close()
+
+    def stats(self):
+        """Retourne les statistiques d'utilisation du cache (même format que DiskCache.stats)"""
+        with self._lock:
+            entries = len(self._entries)
+            total = self._map.size() if self._map is not None else 0
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total
+        }